@@ -0,0 +1,114 @@
+"""
+Пропускная способность GET /check в зависимости от числа воркеров uvicorn.
+
+Запускает main.py с LOOM_AUTHORIZATION_WORKERS=N для каждого N из --workers,
+нагружает /check из нескольких процессов и печатает RPS. База данных не нужна:
+токен подписывается локально тем же секретом. Остальные переменные окружения
+передаются сервису как есть, например LOOM_AUTHORIZATION_CHECK_FAST_PATH=true.
+
+    python benchmark/http_workers.py --workers 1,2,4 --duration 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import jwt
+
+ROOT = Path(__file__).parent.parent
+PORT = 18000
+PREFIX = "/api/authorization"
+SECRET = "benchmark-secret-key-benchmark-secret-key"
+
+
+def _load(access_token: str, duration: float, concurrency: int, result: multiprocessing.Queue):
+    async def worker(client: httpx.AsyncClient, deadline: float) -> int:
+        count = 0
+        while time.monotonic() < deadline:
+            response = await client.get(PREFIX + "/check", cookies={"Access-Token": access_token})
+            response.raise_for_status()
+            count += 1
+        return count
+
+    async def run() -> int:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", limits=limits) as client:
+            deadline = time.monotonic() + duration
+            counts = await asyncio.gather(*[worker(client, deadline) for _ in range(concurrency)])
+        return sum(counts)
+
+    result.put(asyncio.run(run()))
+
+
+def _wait_ready(server: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"сервис завершился с кодом {server.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{PORT}{PREFIX}/health").status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("сервис не поднялся")
+
+
+def bench(workers: int, duration: float, load_processes: int, concurrency: int) -> float:
+    env = {
+        **os.environ,
+        "LOOM_AUTHORIZATION_WORKERS": str(workers),
+        "LOOM_AUTHORIZATION_PORT": str(PORT),
+        "LOOM_JWT_SECRET_KEY": SECRET,
+        "LOOM_ALERT_TG_BOT_TOKEN": os.getenv("LOOM_ALERT_TG_BOT_TOKEN", "1:benchmark"),
+    }
+    server = subprocess.Popen([sys.executable, "main.py"], cwd=ROOT, env=env)
+    try:
+        _wait_ready(server)
+
+        access_token = jwt.encode(
+            {"account_id": 1, "two_fa_status": False, "role": "employee", "exp": int(time.time()) + 3600},
+            SECRET,
+            algorithm="HS256",
+        )
+
+        result = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=_load, args=(access_token, duration, concurrency, result))
+            for _ in range(load_processes)
+        ]
+        for process in processes:
+            process.start()
+        total = sum(result.get() for _ in processes)
+        for process in processes:
+            process.join()
+
+        return total / duration
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Масштабирование /check по числу воркеров")
+    parser.add_argument("--workers", default=f"1,2,{os.cpu_count() or 1}")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--load-processes", type=int, default=max((os.cpu_count() or 2) // 2, 1))
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    baseline = None
+    print(f"{'workers':>8} {'rps':>10} {'speedup':>8}")
+    for workers in sorted({int(w) for w in args.workers.split(",")}):
+        rps = bench(workers, args.duration, args.load_processes, args.concurrency)
+        baseline = baseline or rps
+        print(f"{workers:>8} {rps:>10.0f} {rps / baseline:>7.2f}x", flush=True)
+
+
+if __name__ == "__main__":
+    main()
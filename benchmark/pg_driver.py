@@ -0,0 +1,114 @@
+"""
+Задержка и CPU на запрос: PG (SQLAlchemy AsyncSession) против RawPG (asyncpg и кэш prepared statements).
+
+Нужна доступная Postgres из переменных окружения сервиса (LOOM_AUTHORIZATION_POSTGRES_*).
+Скрипт создаёт таблицы, если их нет, заводит одну сессию на служебном account_id и
+выполняет --queries раз поиск сессии по refresh токену и создание сессии вместе с аккаунтом:
+сначала последовательно (задержка p50/p99), затем с конкурентностью --concurrency
+(запросов в секунду и CPU процесса на запрос). В конце удаляет свои строки.
+
+    python benchmark/pg_driver.py --queries 20000 --concurrency 50
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from opentelemetry import metrics, trace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from infrastructure.pg.pg import PG
+from infrastructure.pg.raw_pg import RawPG
+from internal import model
+from internal.config.config import Config
+from internal.repo.account.repo import AccountRepo
+
+ACCOUNT_ID = 2_000_000_001
+REFRESH_TOKEN = "benchmark-pg-driver"
+
+
+class _Telemetry:
+    def tracer(self):
+        return trace.get_tracer("benchmark")
+
+    def logger(self):
+        return logging.getLogger("benchmark")
+
+    def meter(self):
+        return metrics.get_meter("benchmark")
+
+
+async def _bench(name: str, db, queries: int, concurrency: int) -> None:
+    repo = AccountRepo(_Telemetry(), db)
+
+    async def query():
+        await repo.session_by_refresh_token(REFRESH_TOKEN)
+        await repo.create_session(ACCOUNT_ID, f"{REFRESH_TOKEN}-{time.monotonic_ns()}", False, "employee", 0)
+
+    # Прогрев: пул соединений и кэш prepared statements
+    for _ in range(100):
+        await query()
+
+    latencies = []
+    for _ in range(queries // 2):
+        start = time.perf_counter()
+        await query()
+        latencies.append((time.perf_counter() - start) / 2)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited():
+        async with semaphore:
+            await query()
+
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    await asyncio.gather(*[limited() for _ in range(queries // 2)])
+    cpu, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+
+    latencies.sort()
+    print(
+        f"{name:>10} "
+        f"{statistics.median(latencies) * 1e6:>9.0f} "
+        f"{latencies[int(len(latencies) * 0.99)] * 1e6:>9.0f} "
+        f"{queries / wall:>9.0f} "
+        f"{cpu / queries * 1e6:>11.0f}",
+        flush=True,
+    )
+
+
+async def run(queries: int, concurrency: int, pgbouncer: bool):
+    cfg = Config()
+    tel = _Telemetry()
+    pg = PG(tel, cfg.db_user, cfg.db_pass, cfg.db_host, cfg.db_port, cfg.db_name)
+    raw_pg = RawPG(tel, cfg.db_user, cfg.db_pass, cfg.db_host, cfg.db_port, cfg.db_name, pgbouncer=pgbouncer)
+
+    await pg.multi_query(model.create_queries)
+    await AccountRepo(tel, pg).create_session(ACCOUNT_ID, REFRESH_TOKEN, False, "employee", 0)
+
+    try:
+        print(f"{'driver':>10} {'p50, us':>9} {'p99, us':>9} {'qps':>9} {'cpu/q, us':>11}")
+        await _bench("sqlalchemy", pg, queries, concurrency)
+        await _bench("asyncpg", raw_pg, queries, concurrency)
+    finally:
+        await pg.delete("DELETE FROM sessions WHERE account_id = :account_id;", {"account_id": ACCOUNT_ID})
+        await pg.delete("DELETE FROM accounts WHERE account_id = :account_id;", {"account_id": ACCOUNT_ID})
+        await raw_pg.close()
+        await pg.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PG против RawPG")
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--pgbouncer", action="store_true", help="RawPG без кэша prepared statements")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.queries, args.concurrency, args.pgbouncer))
+
+
+if __name__ == "__main__":
+    main()
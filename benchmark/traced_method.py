@@ -0,0 +1,107 @@
+"""
+Накладные расходы traced_method на вызов: прежняя реализация (inspect.signature/bind на каждом вызове)
+против текущей (разбор сигнатуры при декорировании, атрибуты только для записываемых span).
+
+Метод с сигнатурой как у AccountRepo.create_session вызывается --calls раз с записываемыми span
+(ALWAYS_ON, без экспорта) и с отброшенными сэмплером (ALWAYS_OFF). База и коллектор не нужны.
+
+    python benchmark/traced_method.py --calls 200000
+"""
+import argparse
+import asyncio
+import inspect
+import sys
+import time
+from functools import wraps
+from pathlib import Path
+
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.sampling import ALWAYS_OFF, ALWAYS_ON
+from opentelemetry.trace import SpanKind, StatusCode
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pkg.trace_wrapper import traced_method
+from pkg.trace_wrapper.trace_wrapper import _serialize_value
+
+
+def legacy_traced_method(span_kind: SpanKind = SpanKind.INTERNAL):
+    # Прежняя реализация async-обертки без изменений
+    exclude_params = {'self', 'cls'}
+    sensitive_params = {'password', 'token', 'secret', 'api_key'}
+
+    def decorator(func):
+        @wraps(func)
+        async def async_wrapper(self, *args, **kwargs):
+            span_name = f"{self.__class__.__name__}.{func.__name__}"
+
+            sig = inspect.signature(func)
+            bound_args = sig.bind(self, *args, **kwargs)
+            bound_args.apply_defaults()
+
+            attributes = {}
+            for param_name, param_value in bound_args.arguments.items():
+                if param_name in exclude_params:
+                    continue
+                if param_name in sensitive_params:
+                    attributes[param_name] = "***REDACTED***"
+                else:
+                    attributes[param_name] = _serialize_value(param_value)
+
+            with self.tracer.start_as_current_span(span_name, kind=span_kind, attributes=attributes) as span:
+                try:
+                    result = await func(self, *args, **kwargs)
+                    span.set_status(StatusCode.OK)
+                    return result
+                except Exception as e:
+                    span.set_status(StatusCode.ERROR, str(e))
+                    raise
+
+        return async_wrapper
+
+    return decorator
+
+
+class Repo:
+    def __init__(self, tracer):
+        self.tracer = tracer
+
+    async def plain(self, account_id: int, refresh_token: str, two_fa_status: bool, role: str, expires_at: int = 0):
+        return account_id
+
+    @legacy_traced_method()
+    async def legacy(self, account_id: int, refresh_token: str, two_fa_status: bool, role: str, expires_at: int = 0):
+        return account_id
+
+    @traced_method()
+    async def current(self, account_id: int, refresh_token: str, two_fa_status: bool, role: str, expires_at: int = 0):
+        return account_id
+
+
+async def _per_call(method, calls: int) -> float:
+    start = time.perf_counter()
+    for i in range(calls):
+        await method(i, "refresh-token", False, "employee")
+    return (time.perf_counter() - start) / calls
+
+
+async def run(calls: int):
+    print(f"{'spans':>10} {'variant':>8} {'us/call':>8} {'overhead, us':>13}")
+    for label, sampler in (("recording", ALWAYS_ON), ("dropped", ALWAYS_OFF)):
+        repo = Repo(TracerProvider(sampler=sampler).get_tracer("benchmark"))
+        baseline = await _per_call(repo.plain, calls)
+        for variant in ("legacy", "current"):
+            per_call = await _per_call(getattr(repo, variant), calls)
+            print(f"{label:>10} {variant:>8} {per_call * 1e6:>8.2f} {(per_call - baseline) * 1e6:>13.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Накладные расходы traced_method")
+    parser.add_argument("--calls", type=int, default=200000)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.calls))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Запись ротаций сессий: построчный UPDATE против write-behind буфера с UPDATE ... FROM unnest(...).
+
+Нужна доступная Postgres из переменных окружения сервиса (LOOM_AUTHORIZATION_POSTGRES_*).
+Скрипт создаёт таблицы, если их нет, заводит --sessions сессий на служебных account_id,
+ротирует их --rotations раз с конкурентностью --concurrency и в конце удаляет свои строки.
+
+    python benchmark/write_behind.py --rotations 20000 --concurrency 200
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+from opentelemetry import metrics, trace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from infrastructure.pg.pg import PG
+from internal import model
+from internal.config.config import Config
+from internal.repo.account.repo import AccountRepo
+
+ACCOUNT_ID_OFFSET = 2_000_000_000
+
+
+class _Telemetry:
+    def tracer(self):
+        return trace.get_tracer("benchmark")
+
+    def logger(self):
+        return logging.getLogger("benchmark")
+
+    def meter(self):
+        return metrics.get_meter("benchmark")
+
+
+async def _rotate(repo: AccountRepo, tokens: dict[int, str], rotations: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    expires_at = int(time.time()) + 3600
+    session_ids = list(tokens.keys())
+    # Ротация - compare-and-swap по текущему токену: одна сессия ротируется последовательно, как одно устройство
+    session_locks = {session_id: asyncio.Lock() for session_id in session_ids}
+
+    async def rotate(i: int):
+        session_id = session_ids[i % len(session_ids)]
+        async with semaphore, session_locks[session_id]:
+            refresh_token = f"benchmark-{time.monotonic_ns()}-{i}"
+            if await repo.rotate_session(
+                    session_id,
+                    tokens[session_id],
+                    refresh_token,
+                    False,
+                    "employee",
+                    expires_at,
+            ):
+                tokens[session_id] = refresh_token
+
+    start = time.perf_counter()
+    await asyncio.gather(*[rotate(i) for i in range(rotations)])
+    elapsed = time.perf_counter() - start
+
+    await repo.close()
+    return elapsed
+
+
+async def run(sessions: int, rotations: int, concurrency: int, max_size: int, max_delay: float):
+    cfg = Config()
+    tel = _Telemetry()
+    db = PG(tel, cfg.db_user, cfg.db_pass, cfg.db_host, cfg.db_port, cfg.db_name)
+    await db.multi_query(model.create_queries)
+
+    seed = AccountRepo(tel, db)
+    account_ids = list(range(ACCOUNT_ID_OFFSET, ACCOUNT_ID_OFFSET + sessions))
+    for account_id in account_ids:
+        await seed.create_session(account_id, f"benchmark-seed-{account_id}", False, "employee", 0)
+    rows = await db.select(
+        "SELECT id, account_id FROM sessions WHERE account_id >= :offset ORDER BY id;",
+        {"offset": ACCOUNT_ID_OFFSET},
+    )
+    tokens = {row[0]: f"benchmark-seed-{row[1]}" for row in rows}
+
+    try:
+        per_row = await _rotate(AccountRepo(tel, db), tokens, rotations, concurrency)
+        batched = await _rotate(
+            AccountRepo(tel, db, write_behind=True, write_behind_max_size=max_size, write_behind_max_delay=max_delay),
+            tokens,
+            rotations,
+            concurrency,
+        )
+    finally:
+        await db.delete("DELETE FROM sessions WHERE account_id >= :offset;", {"offset": ACCOUNT_ID_OFFSET})
+        await db.delete("DELETE FROM accounts WHERE account_id >= :offset;", {"offset": ACCOUNT_ID_OFFSET})
+        await db.close()
+
+    print(f"{'mode':>12} {'seconds':>8} {'rotations/s':>12}")
+    print(f"{'per-row':>12} {per_row:>8.2f} {rotations / per_row:>12.0f}")
+    print(f"{'write-behind':>12} {batched:>8.2f} {rotations / batched:>12.0f}")
+    print(f"speedup {per_row / batched:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Построчный UPDATE против write-behind буфера")
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--rotations", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--max-size", type=int, default=500)
+    parser.add_argument("--max-delay-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.sessions, args.rotations, args.concurrency, args.max_size, args.max_delay_ms / 1000))
+
+
+if __name__ == "__main__":
+    main()
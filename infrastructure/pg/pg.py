@@ -1,28 +1,45 @@
-from typing import Any, Sequence
+import re
+import time
+from functools import lru_cache
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Sequence
 
+from opentelemetry.metrics import CallbackOptions, Observation
 from opentelemetry.trace import Status, StatusCode, SpanKind
-from sqlalchemy import text
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy import text, event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 
-from internal import interface
+from internal import interface, common
 
+# Имя запроса для метрик: из комментария "-- name: ..." в начале запроса, иначе операция и таблица
+_QUERY_NAME_RE = re.compile(r"^\s*--\s*name:\s*(\w+)")
+_QUERY_TABLE_RE = re.compile(r"\b(?:FROM|INTO|UPDATE|TABLE|ON)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?(\w+)", re.I)
 
-def NewPool(
+
+def NewEngine(
         db_user,
         db_pass,
         db_host
         , db_port,
-        db_name
-):
-    async_engine = create_async_engine(
+        db_name,
+        pool_size: int = 15,
+        max_overflow: int = 15,
+        pool_recycle: int = 300,
+        pool_timeout: float = 30,
+) -> AsyncEngine:
+    return create_async_engine(
         f"postgresql+asyncpg://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}",
         echo=False,
         future=True,
-        pool_size=15,
-        max_overflow=15,
-        pool_recycle=300
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_recycle=pool_recycle,
+        pool_timeout=pool_timeout,
     )
 
+
+def NewPool(async_engine: AsyncEngine) -> async_sessionmaker:
     pool = async_sessionmaker(
         bind=async_engine,
         class_=AsyncSession,
@@ -32,41 +49,218 @@ def NewPool(
     return pool
 
 
+@lru_cache(maxsize=1024)
+def query_name(query: str) -> str:
+    match = _QUERY_NAME_RE.match(query)
+    if match:
+        return match.group(1)
+
+    words = query.split(maxsplit=1)
+    operation = words[0].lower() if words else "unknown"
+    table = _QUERY_TABLE_RE.search(query)
+    return f"{operation}_{table.group(1).lower()}" if table else operation
+
+
 class PG(interface.IDB):
 
-    def __init__(self, tel: interface.ITelemetry, db_user, db_pass, db_host, db_port, db_name):
-        self.pool = NewPool(db_user, db_pass, db_host, db_port, db_name)
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            db_user,
+            db_pass,
+            db_host,
+            db_port,
+            db_name,
+            pool_size: int = 15,
+            max_overflow: int = 15,
+            pool_recycle: int = 300,
+            pool_timeout: float = 30,
+            slow_query_threshold: float = 0.2,
+    ):
+        self.engine = NewEngine(
+            db_user, db_pass, db_host, db_port, db_name,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_recycle=pool_recycle,
+            pool_timeout=pool_timeout,
+        )
+        self.pool = NewPool(self.engine)
         self.tracer = tel.tracer()
+        self.logger = tel.logger()
+        self.meter = tel.meter()
+
+        # Метрики пулов: по ним видно, ждем ли мы Postgres или свободное соединение.
+        # Атрибут pool=primary общий с RawPG
+        self.pool_recycle = pool_recycle
+
+        self.meter.create_observable_gauge(
+            "db.client.connections.checked_out",
+            callbacks=[self._observe_checked_out],
+            description="Соединения, выданные из пула",
+        )
+        self.meter.create_observable_gauge(
+            "db.client.connections.overflow",
+            callbacks=[self._observe_overflow],
+            description="Соединения сверх pool_size, открытые в данный момент",
+        )
+        self.pool_wait_time = self.meter.create_histogram(
+            "db.client.connections.wait_time",
+            unit="s",
+            description="Ожидание соединения из пула",
+            explicit_bucket_boundaries_advisory=common.DURATION_BUCKETS,
+        )
+        self.pool_connections_created = self.meter.create_counter(
+            "db.client.connections.created",
+            description="Открытые пулом соединения с Postgres",
+        )
+        self.pool_connections_closed = self.meter.create_counter(
+            "db.client.connections.closed",
+            description="Закрытые пулом соединения, reason=recycle для закрытых по pool_recycle",
+        )
+        self._instrument_engine()
+
+        # Метрики запросов по стабильному имени, медленные запросы пишутся в лог с trace_id
+        self.slow_query_threshold = slow_query_threshold
+        self.query_duration = self.meter.create_histogram(
+            "db.client.operation.duration",
+            unit="s",
+            description="Выполнение запроса без ожидания соединения из пула",
+            explicit_bucket_boundaries_advisory=common.DURATION_BUCKETS,
+        )
+        self.query_returned_rows = self.meter.create_histogram(
+            "db.client.response.returned_rows",
+            description="Строки, возвращенные select",
+        )
+        self.query_errors = self.meter.create_counter(
+            "db.client.operation.errors",
+            description="Запросы, завершившиеся ошибкой",
+        )
+
+        # Сессия открытой транзакции текущей задачи, её подхватывают все запросы внутри transaction()
+        self.transaction_session: ContextVar[AsyncSession | None] = ContextVar(
+            "pg_transaction_session",
+            default=None,
+        )
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        if self.transaction_session.get() is not None:
+            # Вложенная транзакция становится частью внешней
+            yield
+            return
 
-    async def insert(self, query: str, query_params: dict) -> int:
         async with self.pool() as session:
-            result = await session.execute(text(query), query_params)
-            await session.commit()
+            await self._acquire(session)
+            token = self.transaction_session.set(session)
+            try:
+                yield
+                await session.commit()
+            except BaseException:
+                await session.rollback()
+                raise
+            finally:
+                self.transaction_session.reset(token)
+
+    async def insert(self, query: str, query_params: dict) -> int:
+        async with self._session() as session:
+            result = await self._execute(session, query, query_params)
             rows = result.all()
             return rows[0][0]
 
-    async def delete(self, query: str, query_params: dict) -> None:
-        async with self.pool() as session:
-            await session.execute(text(query), query_params)
-            await session.commit()
+    async def delete(self, query: str, query_params: dict) -> int:
+        async with self._session() as session:
+            result = await self._execute(session, query, query_params)
+            return result.rowcount
 
     async def update(self, query: str, query_params: dict) -> None:
-        async with self.pool() as session:
-            await session.execute(text(query), query_params)
-            await session.commit()
+        async with self._session() as session:
+            await self._execute(session, query, query_params)
 
     async def select(self, query: str, query_params: dict) -> Sequence[Any]:
-        async with self.pool() as session:
-            result = await session.execute(text(query), query_params)
+        async with self._session(commit=False) as session:
+            result = await self._execute(session, query, query_params)
             rows = result.all()
+            self.query_returned_rows.record(len(rows), {"db.query.name": query_name(query)})
             return rows
 
     async def multi_query(
             self,
             queries: list[str]
     ) -> None:
-        async with self.pool() as session:
+        async with self._session() as session:
             for query in queries:
-                await session.execute(text(query))
-            await session.commit()
+                await self._execute(session, query, None)
         return None
+
+    @asynccontextmanager
+    async def _session(self, commit: bool = True) -> AsyncIterator[AsyncSession]:
+        session = self.transaction_session.get()
+        if session is not None:
+            # Фиксирует transaction() на выходе
+            yield session
+            return
+
+        async with self.pool() as session:
+            await self._acquire(session)
+            yield session
+            if commit:
+                await session.commit()
+
+    async def close(self) -> None:
+        await self.engine.dispose()
+
+    async def _execute(self, session: AsyncSession, query: str, query_params: dict | None):
+        name = query_name(query)
+        attributes = {"db.query.name": name, "pool": "primary"}
+
+        with self.tracer.start_as_current_span(
+                f"PG {name}",
+                kind=SpanKind.CLIENT,
+                attributes=attributes,
+        ) as span:
+            start = time.perf_counter()
+            try:
+                result = await session.execute(text(query), query_params)
+            except Exception as err:
+                span.set_status(Status(StatusCode.ERROR, str(err)))
+                self.query_errors.add(1, {**attributes, "error.type": type(err).__name__})
+                raise
+            finally:
+                duration = time.perf_counter() - start
+                self.query_duration.record(duration, attributes)
+
+            if 0 < self.slow_query_threshold <= duration:
+                # trace_id и span_id добавляет OtelLogger из текущего span
+                self.logger.warning("Медленный запрос", {
+                    "db.query.name": name,
+                    "db.query.duration": duration,
+                    "pool": "primary",
+                })
+            return result
+
+    async def _acquire(self, session: AsyncSession) -> None:
+        # AsyncSession берет соединение лениво: берем его явно, чтобы отделить ожидание пула от запроса
+        start = time.perf_counter()
+        await session.connection()
+        self.pool_wait_time.record(time.perf_counter() - start, {"pool": "primary"})
+
+    def _instrument_engine(self) -> None:
+        attributes = {"pool": "primary"}
+
+        def on_connect(dbapi_connection, connection_record):
+            connection_record.info["created_at"] = time.monotonic()
+            self.pool_connections_created.add(1, attributes)
+
+        def on_close(dbapi_connection, connection_record):
+            created_at = connection_record.info.get("created_at", time.monotonic())
+            reason = "recycle" if 0 <= self.pool_recycle <= time.monotonic() - created_at else "other"
+            self.pool_connections_closed.add(1, {**attributes, "reason": reason})
+
+        event.listen(self.engine.sync_engine, "connect", on_connect)
+        event.listen(self.engine.sync_engine, "close", on_close)
+
+    def _observe_checked_out(self, options: CallbackOptions) -> list[Observation]:
+        return [Observation(self.engine.sync_engine.pool.checkedout(), {"pool": "primary"})]
+
+    def _observe_overflow(self, options: CallbackOptions) -> list[Observation]:
+        return [Observation(max(self.engine.sync_engine.pool.overflow(), 0), {"pool": "primary"})]
@@ -0,0 +1,260 @@
+import asyncio
+import re
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Sequence
+
+import asyncpg
+from opentelemetry.metrics import CallbackOptions, Observation
+from opentelemetry.trace import Status, StatusCode, SpanKind
+
+from infrastructure.pg.pg import query_name
+from internal import interface, common
+
+# :name -> $n, строковые литералы и приведения вида ::type не трогаем
+_PARAM_RE = re.compile(r"'(?:[^']|'')*'|(?<![:\w]):(\w+)(?!:)")
+
+
+class Row(asyncpg.Record):
+    # Доступ к колонкам через атрибуты, как у строк SQLAlchemy: model.*.serialize работает без изменений
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+class RawPG(interface.IDB):
+    """
+    IDB поверх пула asyncpg без SQLAlchemy.
+
+    Запросы с параметрами выполняются как именованные prepared statements из кэша соединения
+    (statement_cache_size на соединение). Для PgBouncer в режиме transaction/statement pooling
+    кэш выключается: pgbouncer=True.
+
+    Метрики и span запросов и пула те же, что у PG.
+    """
+
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            db_user,
+            db_pass,
+            db_host,
+            db_port,
+            db_name,
+            pgbouncer: bool = False,
+            statement_cache_size: int = 256,
+            pool_size: int = 15,
+            max_overflow: int = 15,
+            pool_idle_timeout: float = 300,
+            pool_timeout: float = 30,
+            pool_min_size: int = 1,
+            slow_query_threshold: float = 0.2,
+    ):
+        self.dsn = f"postgresql://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}"
+        self.statement_cache_size = 0 if pgbouncer else statement_cache_size
+        # Размер как у NewEngine: до pool_size + max_overflow соединений. Открытыми держатся pool_min_size,
+        # остальные открываются по мере нагрузки и закрываются после pool_idle_timeout секунд простоя.
+        # Аналога pool_recycle (максимального возраста соединения) у asyncpg нет
+        self.pool_size = pool_size
+        self.pool_min_size = min(pool_min_size, pool_size)
+        self.max_pool_size = pool_size + max_overflow
+        self.pool_idle_timeout = pool_idle_timeout
+        self.pool_timeout = pool_timeout
+        self.tracer = tel.tracer()
+        self.logger = tel.logger()
+        self.meter = tel.meter()
+
+        self.pool: asyncpg.Pool | None = None
+        self.pool_lock = asyncio.Lock()
+
+        # Текст запроса -> (запрос с $n, порядок имен параметров)
+        self.compiled_queries: dict[str, tuple[str, tuple[str, ...]]] = {}
+
+        self.transaction_connection: ContextVar[asyncpg.Connection | None] = ContextVar(
+            "raw_pg_transaction_connection",
+            default=None,
+        )
+
+        # Метрики под теми же именами, что у PG, pool=primary
+        self.meter.create_observable_gauge(
+            "db.client.connections.checked_out",
+            callbacks=[self._observe_checked_out],
+            description="Соединения, выданные из пула",
+        )
+        self.meter.create_observable_gauge(
+            "db.client.connections.overflow",
+            callbacks=[self._observe_overflow],
+            description="Соединения сверх pool_size, открытые в данный момент",
+        )
+        self.pool_wait_time = self.meter.create_histogram(
+            "db.client.connections.wait_time",
+            unit="s",
+            description="Ожидание соединения из пула",
+            explicit_bucket_boundaries_advisory=common.DURATION_BUCKETS,
+        )
+        self.pool_connections_created = self.meter.create_counter(
+            "db.client.connections.created",
+            description="Открытые пулом соединения с Postgres",
+        )
+        self.slow_query_threshold = slow_query_threshold
+        self.query_duration = self.meter.create_histogram(
+            "db.client.operation.duration",
+            unit="s",
+            description="Выполнение запроса без ожидания соединения из пула",
+            explicit_bucket_boundaries_advisory=common.DURATION_BUCKETS,
+        )
+        self.query_returned_rows = self.meter.create_histogram(
+            "db.client.response.returned_rows",
+            description="Строки, возвращенные select",
+        )
+        self.query_errors = self.meter.create_counter(
+            "db.client.operation.errors",
+            description="Запросы, завершившиеся ошибкой",
+        )
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        if self.transaction_connection.get() is not None:
+            yield
+            return
+
+        async with self._acquire() as conn:
+            async with conn.transaction():
+                token = self.transaction_connection.set(conn)
+                try:
+                    yield
+                finally:
+                    self.transaction_connection.reset(token)
+
+    async def insert(self, query: str, query_params: dict) -> int:
+        sql, args = self._compile(query, query_params)
+        async with self._connection() as conn:
+            return await self._execute(query, lambda: conn.fetchval(sql, *args))
+
+    async def delete(self, query: str, query_params: dict) -> int:
+        sql, args = self._compile(query, query_params)
+        async with self._connection() as conn:
+            status = await self._execute(query, lambda: conn.execute(sql, *args))
+            return int(status.rsplit(" ", 1)[-1])
+
+    async def update(self, query: str, query_params: dict) -> None:
+        sql, args = self._compile(query, query_params)
+        async with self._connection() as conn:
+            await self._execute(query, lambda: conn.execute(sql, *args))
+
+    async def select(self, query: str, query_params: dict) -> Sequence[Any]:
+        sql, args = self._compile(query, query_params)
+        async with self._connection() as conn:
+            rows = await self._execute(query, lambda: conn.fetch(sql, *args, record_class=Row))
+            self.query_returned_rows.record(len(rows), {"db.query.name": query_name(query)})
+            return rows
+
+    async def multi_query(
+            self,
+            queries: list[str]
+    ) -> None:
+        async with self.transaction():
+            async with self._connection() as conn:
+                for query in queries:
+                    await self._execute(query, lambda: conn.execute(query))
+        return None
+
+    async def close(self) -> None:
+        if self.pool is not None:
+            await self.pool.close()
+
+    async def _pool(self) -> asyncpg.Pool:
+        # Пул создается в цикле событий воркера при первом запросе
+        if self.pool is None:
+            async with self.pool_lock:
+                if self.pool is None:
+                    self.pool = await asyncpg.create_pool(
+                        self.dsn,
+                        min_size=self.pool_min_size,
+                        max_size=self.max_pool_size,
+                        max_inactive_connection_lifetime=self.pool_idle_timeout,
+                        statement_cache_size=self.statement_cache_size,
+                        init=self._on_connect,
+                    )
+        return self.pool
+
+    @asynccontextmanager
+    async def _connection(self) -> AsyncIterator[asyncpg.Connection]:
+        conn = self.transaction_connection.get()
+        if conn is not None:
+            yield conn
+            return
+
+        async with self._acquire() as conn:
+            yield conn
+
+    @asynccontextmanager
+    async def _acquire(self) -> AsyncIterator[asyncpg.Connection]:
+        pool = await self._pool()
+        start = time.perf_counter()
+        async with pool.acquire(timeout=self.pool_timeout) as conn:
+            self.pool_wait_time.record(time.perf_counter() - start, {"pool": "primary"})
+            yield conn
+
+    async def _execute(self, query: str, execute: Callable[[], Awaitable[Any]]) -> Any:
+        name = query_name(query)
+        attributes = {"db.query.name": name, "pool": "primary"}
+
+        with self.tracer.start_as_current_span(
+                f"PG {name}",
+                kind=SpanKind.CLIENT,
+                attributes=attributes,
+        ) as span:
+            start = time.perf_counter()
+            try:
+                result = await execute()
+            except Exception as err:
+                span.set_status(Status(StatusCode.ERROR, str(err)))
+                self.query_errors.add(1, {**attributes, "error.type": type(err).__name__})
+                raise
+            finally:
+                duration = time.perf_counter() - start
+                self.query_duration.record(duration, attributes)
+
+            if 0 < self.slow_query_threshold <= duration:
+                self.logger.warning("Медленный запрос", {
+                    "db.query.name": name,
+                    "db.query.duration": duration,
+                    "pool": "primary",
+                })
+            return result
+
+    async def _on_connect(self, conn: asyncpg.Connection) -> None:
+        self.pool_connections_created.add(1, {"pool": "primary"})
+
+    def _observe_checked_out(self, options: CallbackOptions) -> list[Observation]:
+        if self.pool is None:
+            return []
+        return [Observation(self.pool.get_size() - self.pool.get_idle_size(), {"pool": "primary"})]
+
+    def _observe_overflow(self, options: CallbackOptions) -> list[Observation]:
+        if self.pool is None:
+            return []
+        return [Observation(max(self.pool.get_size() - self.pool_size, 0), {"pool": "primary"})]
+
+    def _compile(self, query: str, query_params: dict) -> tuple[str, list]:
+        compiled = self.compiled_queries.get(query)
+        if compiled is None:
+            names: list[str] = []
+
+            def replace(match: re.Match) -> str:
+                name = match.group(1)
+                if name is None:
+                    return match.group(0)
+                if name not in names:
+                    names.append(name)
+                return f"${names.index(name) + 1}"
+
+            compiled = (_PARAM_RE.sub(replace, query), tuple(names))
+            self.compiled_queries[query] = compiled
+
+        sql, names = compiled
+        return sql, [query_params[name] for name in names]
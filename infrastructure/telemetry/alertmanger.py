@@ -44,6 +44,13 @@ class AlertManager:
         else:
             self.openai_client = None
 
+    async def close(self):
+        await self.bot.session.close()
+        if self.redis_client.async_client is not None:
+            await self.redis_client.async_client.aclose()
+        if self.openai_client is not None:
+            await self.openai_client.close()
+
     def send_error_alert(self, trace_id: str, span_id: str, traceback: str):
         loop = asyncio.get_running_loop()
         loop.create_task(self.__send_error_alert(trace_id, span_id, traceback))
@@ -1,10 +1,12 @@
 import logging
-
-import inspect
+import queue
+import sys
 from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
 from typing import Union
 
-from opentelemetry import trace
+from opentelemetry import trace, context
+from opentelemetry.metrics import Meter
 from opentelemetry.sdk._logs import LoggerProvider, LoggingHandler
 
 from internal import common
@@ -20,6 +22,10 @@ class OtelLogger(interface.IOtelLogger):
             logger_provider: LoggerProvider,
             service_name: str,
             log_context: ContextVar[dict],
+            log_level: str = "DEBUG",
+            meter: Meter | None = None,
+            caller_info: bool = True,
+            queue_size: int = 10000,
     ):
         self.handler = LoggingHandler(
             level=logging.DEBUG,
@@ -28,16 +34,43 @@ class OtelLogger(interface.IOtelLogger):
         self.service_name = service_name
         self.log_context = log_context
 
+        # Записи ниже уровня отсекаются в log() до сбора атрибутов
+        self.level = logging.getLevelName(log_level.upper())
+        if not isinstance(self.level, int):
+            self.level = logging.DEBUG
+
+        # Файл и строка вызова: кэш по (code, строка), без обхода стека через inspect
+        self.caller_info = caller_info
+        self.caller_info_cache: dict[tuple, str] = {}
+
+        # Преобразование записи и LoggingHandler работают в отдельном потоке, а не в цикле событий
+        dropped = meter.create_counter(
+            "telemetry.logs.dropped",
+            description="Записи лога, не поместившиеся в очередь",
+        ) if meter is not None else None
+        self.queue_handler = _DroppingQueueHandler(queue.Queue(queue_size), dropped)
+        self.queue_listener = QueueListener(
+            self.queue_handler.queue,
+            _AttachContextHandler(self.handler),
+            respect_handler_level=True,
+        )
+        self.queue_listener.start()
+
         self.logger = logging.getLogger("main")
-        self.logger.setLevel(logging.DEBUG)
-        self.logger.addHandler(self.handler)
+        self.logger.setLevel(self.level)
+        self.logger.addHandler(self.queue_handler)
         self.logger.propagate = False
 
         self.alert_manger = alert_manger
 
     def log(self, level: str, message: str, fields: dict = None) -> None:
-        file_info = self._get_caller_info(3)
-        attributes: dict = {common.FILE_KEY: file_info}
+        log_level = _LEVELS.get(level, logging.INFO)
+        if log_level < self.level:
+            return
+
+        attributes: dict = {}
+        if self.caller_info:
+            attributes[common.FILE_KEY] = self._get_caller_info(3)
 
         context_fields = self.log_context.get()
         if context_fields:
@@ -67,10 +100,11 @@ class OtelLogger(interface.IOtelLogger):
                         attributes.get(common.TRACEBACK_KEY, "")
                     )
 
-        log_level = getattr(logging, level.upper(), logging.INFO)
         self.logger.log(log_level, self.service_name + " | " + message, extra=attributes)
 
-
+    def stop(self) -> None:
+        # Дописывает накопленные в очереди записи в LoggingHandler
+        self.queue_listener.stop()
 
     def _extract_extra_params(self, fields: dict) -> dict:
         extra_attrs = {}
@@ -88,22 +122,16 @@ class OtelLogger(interface.IOtelLogger):
 
     def _get_caller_info(self, skip: int) -> str:
         try:
-            frame = inspect.currentframe()
-            for _ in range(skip):
-                if frame is None:
-                    break
-                frame = frame.f_back
-
-            if frame is None:
-                return "unknown:0"
-
-            filename = frame.f_code.co_filename
-            line_number = frame.f_lineno
-
-            return f"{filename}:{line_number}"
-        except Exception:
+            frame = sys._getframe(skip)
+        except ValueError:
             return "unknown:0"
 
+        key = (frame.f_code, frame.f_lineno)
+        file_info = self.caller_info_cache.get(key)
+        if file_info is None:
+            file_info = self.caller_info_cache[key] = f"{frame.f_code.co_filename}:{frame.f_lineno}"
+        return file_info
+
     def debug(self, message: str, fields: dict = None) -> None:
         self.log("DEBUG", message, fields)
 
@@ -115,3 +143,47 @@ class OtelLogger(interface.IOtelLogger):
 
     def error(self, message: str, fields: dict = None) -> None:
         self.log("ERROR", message, fields)
+
+
+_LEVELS = {
+    "DEBUG": logging.DEBUG,
+    "INFO": logging.INFO,
+    "WARN": logging.WARNING,
+    "WARNING": logging.WARNING,
+    "ERROR": logging.ERROR,
+}
+
+
+class _DroppingQueueHandler(QueueHandler):
+    def __init__(self, log_queue: queue.Queue, dropped):
+        super().__init__(log_queue)
+        self.dropped = dropped
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Сообщение уже собрано в OtelLogger.log, форматирование оставляем потоку QueueListener.
+        # LoggingHandler берет trace_id и span_id из текущего контекста - передаем его вместе с записью
+        record._otel_context = context.get_current()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if self.dropped is not None:
+                self.dropped.add(1, {"level": record.levelname})
+
+
+class _AttachContextHandler(logging.Handler):
+    # Выполняет handler в контексте OpenTelemetry, в котором запись была создана
+    def __init__(self, handler: logging.Handler):
+        super().__init__(handler.level)
+        self.handler = handler
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        otel_context = record.__dict__.pop("_otel_context", None)
+        token = context.attach(otel_context) if otel_context is not None else None
+        try:
+            return self.handler.handle(record)
+        finally:
+            if token is not None:
+                context.detach(token)
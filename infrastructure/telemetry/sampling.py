@@ -0,0 +1,224 @@
+import threading
+from collections import OrderedDict
+from typing import Optional, Sequence
+
+from opentelemetry.context import Context
+from opentelemetry.metrics import Counter
+from opentelemetry.sdk.trace import ReadableSpan, Span, SpanProcessor
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+from opentelemetry.sdk.trace.sampling import (
+    ALWAYS_OFF,
+    ALWAYS_ON,
+    Decision,
+    ParentBased,
+    Sampler,
+    SamplingResult,
+    TraceIdRatioBased,
+)
+from opentelemetry.trace import Link, SpanContext, SpanKind, StatusCode, TraceFlags, get_current_span
+from opentelemetry.util.types import Attributes
+
+_TRACE_ID_LIMIT = (1 << 64) - 1
+
+
+def new_sampler(mode: str, ratio: float) -> Sampler:
+    """
+    always_on    - все трейсы
+    ratio        - доля ratio по trace_id, решение вышестоящего сервиса игнорируется
+    parent_ratio - решение вышестоящего сервиса, для корневых span доля ratio
+    tail         - все span пишутся, решение принимает TailSamplingProcessor по завершении трейса.
+                   До решения флаг sampled не выставляется и не передается нижестоящим сервисам:
+                   иначе они экспортировали бы поддеревья трейсов, которые здесь потом отбрасываются.
+                   Трейсы, выбранные вышестоящим сервисом, пишутся как есть
+    """
+    if mode == "ratio":
+        return TraceIdRatioBased(ratio)
+    if mode == "parent_ratio":
+        return ParentBased(TraceIdRatioBased(ratio))
+    if mode == "tail":
+        return ParentBased(
+            root=RECORD_ONLY,
+            remote_parent_sampled=ALWAYS_ON,
+            remote_parent_not_sampled=ALWAYS_OFF,
+            local_parent_sampled=ALWAYS_ON,
+            local_parent_not_sampled=RECORD_ONLY,
+        )
+    return ALWAYS_ON
+
+
+class RecordOnlySampler(Sampler):
+    # Span записывается для TailSamplingProcessor, но без флага sampled
+    def should_sample(
+            self,
+            parent_context: Optional[Context],
+            trace_id: int,
+            name: str,
+            kind: SpanKind = None,
+            attributes: Attributes = None,
+            links: Sequence[Link] = None,
+            trace_state=None,
+    ) -> SamplingResult:
+        parent_span_context = get_current_span(parent_context).get_span_context()
+        return SamplingResult(
+            Decision.RECORD_ONLY,
+            attributes,
+            parent_span_context.trace_state if parent_span_context.is_valid else None,
+        )
+
+    def get_description(self) -> str:
+        return "RecordOnlySampler"
+
+
+RECORD_ONLY = RecordOnlySampler()
+
+
+class CountingSampler(Sampler):
+    # Считает span, отброшенные на старте: их не записывают и не экспортируют
+    def __init__(self, sampler: Sampler, dropped: Counter):
+        self.sampler = sampler
+        self.dropped = dropped
+
+    def should_sample(
+            self,
+            parent_context: Optional[Context],
+            trace_id: int,
+            name: str,
+            kind: SpanKind = None,
+            attributes: Attributes = None,
+            links: Sequence[Link] = None,
+            trace_state=None,
+    ) -> SamplingResult:
+        result = self.sampler.should_sample(parent_context, trace_id, name, kind, attributes, links, trace_state)
+        if result.decision == Decision.DROP:
+            self.dropped.add(1, {"reason": "head"})
+        return result
+
+    def get_description(self) -> str:
+        return f"Counting{{{self.sampler.get_description()}}}"
+
+
+class CountingSpanExporter(SpanExporter):
+    def __init__(self, exporter: SpanExporter, exported: Counter, dropped: Counter):
+        self.exporter = exporter
+        self.exported = exported
+        self.dropped = dropped
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        result = self.exporter.export(spans)
+        if result == SpanExportResult.SUCCESS:
+            self.exported.add(len(spans))
+        else:
+            self.dropped.add(len(spans), {"reason": "export_failed"})
+        return result
+
+    def shutdown(self) -> None:
+        self.exporter.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.exporter.force_flush(timeout_millis)
+
+
+class TailSamplingProcessor(SpanProcessor):
+    """
+    Копит завершенные span трейса до завершения его локального корня и решает по трейсу целиком:
+    трейсы с ошибкой и медленные сохраняются всегда, остальные - с долей ratio.
+    Трейсы, уже выбранные вышестоящим сервисом, сохраняются всегда.
+    """
+
+    def __init__(
+            self,
+            next_processor: SpanProcessor,
+            dropped: Counter,
+            ratio: float,
+            slow_threshold: float,
+            max_traces: int = 10000,
+    ):
+        self.next_processor = next_processor
+        self.ratio_bound = round(max(min(ratio, 1.0), 0.0) * _TRACE_ID_LIMIT)
+        self.slow_threshold_ns = int(slow_threshold * 1e9)
+        self.max_traces = max_traces
+
+        self.lock = threading.Lock()
+        self.pending: OrderedDict[int, list[ReadableSpan]] = OrderedDict()
+        # Решения по уже закрытым трейсам: для span, завершившихся позже корня
+        self.decisions: OrderedDict[int, bool] = OrderedDict()
+
+        self.dropped = dropped
+
+    def on_start(self, span: Span, parent_context: Optional[Context] = None) -> None:
+        self.next_processor.on_start(span, parent_context)
+
+    def on_end(self, span: ReadableSpan) -> None:
+        trace_id = span.context.trace_id
+
+        with self.lock:
+            decision = self.decisions.get(trace_id)
+            if decision is None:
+                spans = self.pending.get(trace_id)
+                if spans is None:
+                    spans = self.pending[trace_id] = []
+                    if len(self.pending) > self.max_traces:
+                        _, evicted = self.pending.popitem(last=False)
+                        self.dropped.add(len(evicted), {"reason": "tail_overflow"})
+                spans.append(span)
+
+                if span.parent is not None and not span.parent.is_remote:
+                    return
+
+                # Завершился локальный корень: решение по всему трейсу
+                spans = self.pending.pop(trace_id)
+                decision = self._keep(span, spans)
+                self.decisions[trace_id] = decision
+                if len(self.decisions) > self.max_traces:
+                    self.decisions.popitem(last=False)
+            else:
+                spans = [span]
+
+        if decision:
+            for kept in spans:
+                self.next_processor.on_end(_sampled(kept))
+        else:
+            self.dropped.add(len(spans), {"reason": "tail"})
+
+    def shutdown(self) -> None:
+        self.next_processor.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.next_processor.force_flush(timeout_millis)
+
+    def _keep(self, root: ReadableSpan, spans: list[ReadableSpan]) -> bool:
+        if root.parent is not None and root.parent.trace_flags.sampled:
+            return True
+        if any(span.status.status_code == StatusCode.ERROR for span in spans):
+            return True
+        if root.end_time - root.start_time >= self.slow_threshold_ns:
+            return True
+        return (root.context.trace_id & _TRACE_ID_LIMIT) < self.ratio_bound
+
+
+def _sampled(span: ReadableSpan) -> ReadableSpan:
+    # Экспортеры пропускают span без флага sampled: выбранному трейсу флаг выставляется при сохранении
+    if span.context.trace_flags.sampled:
+        return span
+
+    context = SpanContext(
+        span.context.trace_id,
+        span.context.span_id,
+        span.context.is_remote,
+        TraceFlags(span.context.trace_flags | TraceFlags.SAMPLED),
+        span.context.trace_state,
+    )
+    return ReadableSpan(
+        name=span.name,
+        context=context,
+        parent=span.parent,
+        resource=span.resource,
+        attributes=span.attributes,
+        events=span.events,
+        links=span.links,
+        kind=span.kind,
+        status=span.status,
+        start_time=span.start_time,
+        end_time=span.end_time,
+        instrumentation_scope=span.instrumentation_scope,
+    )
@@ -4,8 +4,7 @@ from opentelemetry import trace, metrics, propagate
 from opentelemetry.sdk.trace import TracerProvider, SpanLimits
 from opentelemetry._logs import set_logger_provider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
-from opentelemetry.sdk.trace.sampling import TraceIdRatioBased, ALWAYS_ON
-from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics import AlwaysOnExemplarFilter, MeterProvider, TraceBasedExemplarFilter
 from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
 from opentelemetry.sdk._logs import LoggerProvider
 from opentelemetry.sdk._logs.export import BatchLogRecordProcessor
@@ -19,6 +18,7 @@ from opentelemetry.baggage.propagation import W3CBaggagePropagator
 from opentelemetry.propagators.composite import CompositePropagator
 
 from .logger import OtelLogger
+from .sampling import new_sampler, CountingSampler, CountingSpanExporter, TailSamplingProcessor
 from .alertmanger import AlertManager
 from internal import interface
 
@@ -33,7 +33,12 @@ class Telemetry(interface.ITelemetry):
             otlp_host: str,
             otlp_port: int,
             log_context: ContextVar[dict],
-            alert_manager: AlertManager = None
+            alert_manager: AlertManager = None,
+            log_caller_info: bool = True,
+            log_queue_size: int = 10000,
+            trace_sampler: str = "always_on",
+            trace_sample_ratio: float = 1.0,
+            trace_slow_threshold: float = 0.5,
     ):
 
         self.log_level = log_level
@@ -44,13 +49,19 @@ class Telemetry(interface.ITelemetry):
         self.service_version = service_version
         self.otlp_endpoint = f"{otlp_host}:{otlp_port}"
         self.alert_manager = alert_manager
+        self.log_caller_info = log_caller_info
+        self.log_queue_size = log_queue_size
+        self.trace_sampler = trace_sampler
+        self.trace_sample_ratio = trace_sample_ratio
+        self.trace_slow_threshold = trace_slow_threshold
 
         self._setup_telemetry()
 
     def _setup_telemetry(self) -> None:
         resource = self._create_resource()
-        self._setup_tracing(resource)
+        # Метрики раньше трейсинга: сэмплер и экспортер span пишут в них
         self._setup_metrics(resource)
+        self._setup_tracing(resource)
         self._setup_logging(resource)
         self._setup_propagators()
         self._setup_logger()
@@ -65,15 +76,28 @@ class Telemetry(interface.ITelemetry):
         })
 
     def _setup_tracing(self, resource: Resource) -> None:
-        otlp_exporter = OTLPSpanExporter(
-            endpoint=f"http://{self.otlp_endpoint}",
-            insecure=True
+        spans_exported = self._meter.create_counter(
+            "telemetry.spans.exported",
+            description="Span, успешно отправленные в коллектор",
+        )
+        spans_dropped = self._meter.create_counter(
+            "telemetry.spans.dropped",
+            description="Span, не попавшие в экспорт, по причине reason",
         )
 
-        if self.environment == "prod":
-            sampler = ALWAYS_ON
-        else:
-            sampler = ALWAYS_ON
+        otlp_exporter = CountingSpanExporter(
+            OTLPSpanExporter(
+                endpoint=f"http://{self.otlp_endpoint}",
+                insecure=True
+            ),
+            spans_exported,
+            spans_dropped,
+        )
+
+        sampler = CountingSampler(
+            new_sampler(self.trace_sampler, self.trace_sample_ratio),
+            spans_dropped,
+        )
 
         span_limits = SpanLimits(
             max_span_attributes=256,
@@ -95,6 +119,13 @@ class Telemetry(interface.ITelemetry):
             max_queue_size=2048,
             export_timeout_millis=5000
         )
+        if self.trace_sampler == "tail":
+            span_processor = TailSamplingProcessor(
+                span_processor,
+                spans_dropped,
+                self.trace_sample_ratio,
+                self.trace_slow_threshold,
+            )
         self._tracer_provider.add_span_processor(span_processor)
         trace.set_tracer_provider(self._tracer_provider)
 
@@ -114,9 +145,12 @@ class Telemetry(interface.ITelemetry):
             export_interval_millis=30000
         )
 
+        # Exemplars берутся из измерений внутри записываемого span и ссылаются на его trace_id.
+        # В режиме tail до решения по трейсу флага sampled нет: exemplars берутся из всех измерений
         self._meter_provider = MeterProvider(
             resource=resource,
-            metric_readers=[reader]
+            metric_readers=[reader],
+            exemplar_filter=AlwaysOnExemplarFilter() if self.trace_sampler == "tail" else TraceBasedExemplarFilter(),
         )
 
         metrics.set_meter_provider(self._meter_provider)
@@ -157,7 +191,11 @@ class Telemetry(interface.ITelemetry):
             self.alert_manager,
             self._logger_provider,
             self.service_name,
-            self.log_context
+            self.log_context,
+            log_level=self.log_level,
+            meter=self._meter,
+            caller_info=self.log_caller_info,
+            queue_size=self.log_queue_size,
         )
 
     def logger(self) -> interface.IOtelLogger:
@@ -184,6 +222,12 @@ class Telemetry(interface.ITelemetry):
         except Exception as err:
             errors.append(f"meter provider shutdown: {err}")
 
+        try:
+            if hasattr(self, '_logger'):
+                self._logger.stop()
+        except Exception as err:
+            errors.append(f"logger queue stop: {err}")
+
         try:
             if hasattr(self, '_logger_provider'):
                 self._logger_provider.shutdown()
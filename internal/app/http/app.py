@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 
 from internal import interface, model
+from internal.controller.http.middlerware.middleware import CheckFastPathMiddleware
 from internal.controller.http.handler.account.model import *
 
 
@@ -9,14 +10,20 @@ def NewHTTP(
         authorization_controller: interface.IAuthorizationController,
         http_middleware: interface.IHttpMiddleware,
         prefix: str,
-        environment: str
+        environment: str,
+        lifespan=None,
+        check_fast_path: bool = False,
 ):
     app = FastAPI(
         openapi_url=prefix + "/openapi.json",
         docs_url=prefix + "/docs",
         redoc_url=prefix + "/redoc",
+        lifespan=lifespan,
     )
 
+    # Fast path должен оказаться внутри trace/logger middleware, поэтому добавляется первым
+    if check_fast_path:
+        include_check_fast_path(app, authorization_controller, prefix)
     include_middleware(app, http_middleware)
     include_db_handler(app, db, prefix, environment)
     include_authorization_handlers(app, authorization_controller, prefix)
@@ -32,6 +39,18 @@ def include_middleware(
     http_middleware.trace_middleware01(app)
 
 
+def include_check_fast_path(
+        app: FastAPI,
+        authorization_controller: interface.IAuthorizationController,
+        prefix: str
+):
+    app.add_middleware(
+        CheckFastPathMiddleware,
+        authorization_controller=authorization_controller,
+        path=prefix + "/check",
+    )
+
+
 def include_authorization_handlers(
         app: FastAPI,
         authorization_controller: interface.IAuthorizationController,
@@ -64,6 +83,23 @@ def include_authorization_handlers(
         response_model=CheckAuthorizationResponse,
     )
 
+    # Проверка пачки токенов
+    app.add_api_route(
+        prefix + "/check/batch",
+        authorization_controller.check_authorization_batch,
+        tags=["Authorization"],
+        methods=["POST"],
+        response_model=CheckAuthorizationBatchResponse,
+    )
+
+    # Проверка токена для reverse proxy (nginx auth_request / Traefik ForwardAuth)
+    app.add_api_route(
+        prefix + "/forward-auth",
+        authorization_controller.forward_auth,
+        tags=["Authorization"],
+        methods=["GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
+    )
+
     # Обновление токенов
     app.add_api_route(
         prefix + "/refresh",
@@ -72,6 +108,15 @@ def include_authorization_handlers(
         methods=["POST"],
     )
 
+    # Публичные ключи для локальной проверки токенов (JWKS)
+    app.add_api_route(
+        prefix + "/jwks",
+        authorization_controller.public_keys,
+        tags=["Authorization"],
+        methods=["GET"],
+        response_model=PublicKeysResponse,
+    )
+
 
 def include_db_handler(app: FastAPI, db: interface.IDB, prefix: str, environment: str):
     app.add_api_route(prefix + "/table/create", create_table_handler(db), methods=["GET"])
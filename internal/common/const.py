@@ -10,6 +10,11 @@ HTTP_METHOD_KEY = "http.request.method"
 HTTP_STATUS_KEY = "http.response.status_code"
 HTTP_ROUTE_KEY = "http.route"
 HTTP_REQUEST_DURATION_KEY = "http.server.request.duration"
+HTTP_REQUESTS_KEY = "http.server.requests"
+HTTP_REQUEST_ERRORS_KEY = "http.server.request.errors"
+
+# Границы бакетов для гистограмм длительности в секундах: границы SDK по умолчанию рассчитаны на миллисекунды
+DURATION_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
 
 TELEGRAM_CHAT_ID_KEY = "telegram.chat.id"
 TELEGRAM_USER_USERNAME_KEY = "telegram.user.username"
@@ -7,10 +7,26 @@ class Config:
         self.environment = os.getenv("ENVIRONMENT", "dev")
         self.service_name = os.getenv("LOOM_AUTHORIZATION_CONTAINER_NAME", "loom-account")
         self.http_port = os.getenv("LOOM_AUTHORIZATION_PORT", "8000")
+        # По умолчанию - доступные процессу CPU, но не больше 4: у каждого воркера свой пул соединений.
+        # os.cpu_count() видит все CPU хоста и не учитывает affinity контейнера
+        self.http_workers = int(os.getenv("LOOM_AUTHORIZATION_WORKERS", str(min(_available_cpus(), 4))))
+        self.http_graceful_shutdown_timeout = int(os.getenv("LOOM_AUTHORIZATION_GRACEFUL_SHUTDOWN_TIMEOUT", "30"))
         self.service_version = os.getenv("SERVICE_VERSION", "1.0.0")
         self.root_path = os.getenv("ROOT_PATH", "/")
         self.prefix = os.getenv("LOOM_AUTHORIZATION_PREFIX", "/api/authorization")
         self.log_level = os.getenv("LOG_LEVEL", "INFO")
+        self.log_caller_info = os.getenv("LOOM_AUTHORIZATION_LOG_CALLER_INFO", "true") == "true"
+        self.log_queue_size = int(os.getenv("LOOM_AUTHORIZATION_LOG_QUEUE_SIZE", "10000"))
+        # Режим auto_log: all | off | errors | sampled | slow
+        self.auto_log_mode = os.getenv("LOOM_AUTHORIZATION_AUTO_LOG", "all")
+        self.auto_log_sample_ratio = float(os.getenv("LOOM_AUTHORIZATION_AUTO_LOG_SAMPLE_RATIO", "0.01"))
+        self.auto_log_slow_threshold = float(os.getenv("LOOM_AUTHORIZATION_AUTO_LOG_SLOW_MS", "500")) / 1000
+        # Режимы для отдельных методов: "AuthorizationController.check_authorization=errors,..."
+        self.auto_log_routes = {
+            route.split("=", 1)[0].strip(): route.split("=", 1)[1].strip()
+            for route in os.getenv("LOOM_AUTHORIZATION_AUTO_LOG_ROUTES", "").split(",")
+            if "=" in route
+        }
         self.domain = os.getenv("LOOM_DOMAIN", "localhost")
 
         # Настройки базы данных
@@ -19,9 +35,37 @@ class Config:
         self.db_name = os.getenv("LOOM_AUTHORIZATION_POSTGRES_DB_NAME", "hr_interview")
         self.db_user = os.getenv("LOOM_AUTHORIZATION_POSTGRES_USER", "postgres")
         self.db_pass = os.getenv("LOOM_AUTHORIZATION_POSTGRES_PASSWORD", "password")
+        # Пул на воркер: всего к Postgres до http_workers * (pool_size + max_overflow) соединений.
+        # По умолчанию 30 соединений делятся между воркерами
+        self.db_pool_size = int(os.getenv("LOOM_AUTHORIZATION_POSTGRES_POOL_SIZE", str(max(15 // self.http_workers, 2))))
+        self.db_max_overflow = int(os.getenv("LOOM_AUTHORIZATION_POSTGRES_MAX_OVERFLOW", str(max(15 // self.http_workers, 2))))
+        self.db_pool_recycle = int(os.getenv("LOOM_AUTHORIZATION_POSTGRES_POOL_RECYCLE", "300"))
+        self.db_pool_timeout = float(os.getenv("LOOM_AUTHORIZATION_POSTGRES_POOL_TIMEOUT", "30"))
+        # Только для asyncpg: соединения, открытые всегда, и закрытие простаивающих вместо pool_recycle
+        self.db_pool_min_size = int(os.getenv("LOOM_AUTHORIZATION_POSTGRES_POOL_MIN_SIZE", "1"))
+        self.db_pool_idle_timeout = float(os.getenv("LOOM_AUTHORIZATION_POSTGRES_POOL_IDLE_TIMEOUT", "300"))
+        # Порог медленного запроса, 0 - не логировать
+        self.db_slow_query_threshold = float(os.getenv("LOOM_AUTHORIZATION_POSTGRES_SLOW_QUERY_MS", "200")) / 1000
+        # sqlalchemy - PG через AsyncSession, asyncpg - RawPG с кэшем prepared statements
+        self.db_driver = os.getenv("LOOM_AUTHORIZATION_POSTGRES_DRIVER", "sqlalchemy")
+        self.db_pgbouncer = os.getenv("LOOM_AUTHORIZATION_POSTGRES_PGBOUNCER", "false") == "true"
+        self.db_statement_cache_size = int(os.getenv("LOOM_AUTHORIZATION_POSTGRES_STATEMENT_CACHE_SIZE", "256"))
 
         # Настройки JWT
         self.jwt_secret_key = os.getenv("LOOM_JWT_SECRET_KEY", "your-secret-key-here")
+        self.jwt_algorithm = os.getenv("LOOM_JWT_ALGORITHM", "HS256")
+        self.jwt_private_key = os.getenv("LOOM_JWT_PRIVATE_KEY", "").replace("\\n", "\n")
+        self.jwt_key_id = os.getenv("LOOM_JWT_KEY_ID", "")
+        self.forward_auth_cache_ttl = int(os.getenv("LOOM_AUTHORIZATION_FORWARD_AUTH_CACHE_TTL", "5"))
+        self.check_fast_path = os.getenv("LOOM_AUTHORIZATION_CHECK_FAST_PATH", "false") == "true"
+        self.opaque_refresh_token = os.getenv("LOOM_AUTHORIZATION_OPAQUE_REFRESH_TOKEN", "false") == "true"
+        self.opaque_refresh_token_tg = os.getenv("LOOM_AUTHORIZATION_OPAQUE_REFRESH_TOKEN_TG", "false") == "true"
+        self.session_sweep_interval = int(os.getenv("LOOM_AUTHORIZATION_SESSION_SWEEP_INTERVAL", "300"))
+        self.session_sweep_batch_size = int(os.getenv("LOOM_AUTHORIZATION_SESSION_SWEEP_BATCH_SIZE", "1000"))
+        self.token_cache_size = int(os.getenv("LOOM_AUTHORIZATION_TOKEN_CACHE_SIZE", "10000"))
+        self.write_behind = os.getenv("LOOM_AUTHORIZATION_WRITE_BEHIND", "false") == "true"
+        self.write_behind_max_size = int(os.getenv("LOOM_AUTHORIZATION_WRITE_BEHIND_MAX_SIZE", "500"))
+        self.write_behind_max_delay = float(os.getenv("LOOM_AUTHORIZATION_WRITE_BEHIND_MAX_DELAY_MS", "5")) / 1000
 
         # Настройки телеметрии
         self.alert_tg_bot_token = os.getenv("LOOM_ALERT_TG_BOT_TOKEN", "")
@@ -37,5 +81,15 @@ class Config:
         # Настройки OpenTelemetry
         self.otlp_host = os.getenv("LOOM_OTEL_COLLECTOR_CONTAINER_NAME", "loom-otel-collector")
         self.otlp_port = int(os.getenv("LOOM_OTEL_COLLECTOR_GRPC_PORT", "4317"))
+        # always_on | ratio | parent_ratio | tail
+        self.trace_sampler = os.getenv("LOOM_AUTHORIZATION_TRACE_SAMPLER", "always_on")
+        self.trace_sample_ratio = float(os.getenv("LOOM_AUTHORIZATION_TRACE_SAMPLE_RATIO", "1.0"))
+        self.trace_slow_threshold = float(os.getenv("LOOM_AUTHORIZATION_TRACE_SLOW_THRESHOLD_MS", "500")) / 1000
 
-        self.openai_api_key = os.getenv("OPENAI_API_KEY", "")
\ No newline at end of file
+        self.openai_api_key = os.getenv("OPENAI_API_KEY", "")
+
+def _available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
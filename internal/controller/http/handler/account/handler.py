@@ -1,5 +1,8 @@
+import json
+import time
+
 import jwt
-from fastapi import Request
+from fastapi import Request, Response
 from fastapi.responses import JSONResponse
 
 from internal import interface, common, model
@@ -14,12 +17,14 @@ class AuthorizationController(interface.IAuthorizationController):
             self,
             tel: interface.ITelemetry,
             authorization_service: interface.IAuthorizationService,
-            domain: str
+            domain: str,
+            forward_auth_cache_ttl: int = 5,
     ):
         self.tracer = tel.tracer()
         self.logger = tel.logger()
         self.authorization_service = authorization_service
         self.domain = domain
+        self.forward_auth_cache_ttl = forward_auth_cache_ttl
 
     @auto_log()
     @traced_method()
@@ -101,6 +106,91 @@ class AuthorizationController(interface.IAuthorizationController):
                 ).model_dump(),
             )
 
+    @auto_log(name="check_authorization")
+    @traced_method(name="check_authorization")
+    async def check_authorization_fast(self, token: str) -> bytes:
+        # Тело ответа GET /check для ASGI fast path, без FastAPI и pydantic.
+        # Span, логи и настройки auto_log те же, что у check_authorization
+        try:
+            token_payload = await self.authorization_service.check_token(token)
+
+            return json.dumps(
+                {
+                    "account_id": token_payload.account_id,
+                    "two_fa_status": token_payload.two_fa_status,
+                    "role": token_payload.role,
+                    "message": "Access-Token verified",
+                    "status_code": 200,
+                },
+                ensure_ascii=False,
+                separators=(",", ":"),
+            ).encode("utf-8")
+        except jwt.ExpiredSignatureError as err:
+            self.logger.warning("Токен истек")
+            return token_expired_body
+        except jwt.InvalidTokenError as err:
+            self.logger.warning("Токен не валиден")
+            return token_invalid_body
+
+    @auto_log()
+    @traced_method()
+    async def forward_auth(self, request: Request):
+        # Ответ для nginx auth_request / Traefik ForwardAuth: статус в HTTP-коде, данные в заголовках, пустое тело
+        access_token = request.cookies.get("Access-Token")
+        if not access_token:
+            authorization = request.headers.get("authorization", "")
+            if authorization[:7].lower() == "bearer ":
+                access_token = authorization[7:]
+
+        if not access_token:
+            return _forward_auth_error(401, "token missing")
+
+        try:
+            token_payload = await self.authorization_service.check_token(access_token)
+        except jwt.ExpiredSignatureError as err:
+            self.logger.warning("Токен истек")
+            return _forward_auth_error(401, "token expired")
+        except jwt.InvalidTokenError as err:
+            self.logger.warning("Токен не валиден")
+            return _forward_auth_error(401, "token invalid")
+
+        # Ограничения задаются в URL подзапроса прокси: ?role=admin&role=owner&two_fa=true
+        roles = request.query_params.getlist("role")
+        if roles and token_payload.role not in roles:
+            return _forward_auth_error(403, "role not allowed")
+        if request.query_params.get("two_fa") == "true" and not token_payload.two_fa_status:
+            return _forward_auth_error(403, "two fa required")
+
+        max_age = max(min(self.forward_auth_cache_ttl, token_payload.exp - int(time.time())), 0)
+
+        # Микрокэш на стороне прокси: s-maxage для общих кэшей, X-Accel-Expires для nginx proxy_cache,
+        # max-age=0 - браузер ответ не хранит. Ответ зависит от токена, поэтому ключ кэша прокси
+        # обязан включать учетные данные, например для nginx:
+        #   proxy_cache_key "$request_uri|$cookie_Access-Token|$http_authorization";
+        return Response(
+            status_code=200,
+            headers={
+                "X-Account-Id": str(token_payload.account_id),
+                "X-Role": token_payload.role,
+                "X-Two-Fa-Status": "true" if token_payload.two_fa_status else "false",
+                "Cache-Control": f"public, s-maxage={max_age}, max-age=0",
+                "X-Accel-Expires": str(max_age),
+                "Vary": "Cookie, Authorization",
+            },
+        )
+
+    @auto_log()
+    @traced_method()
+    async def check_authorization_batch(self, body: CheckAuthorizationBatchBody):
+        results = await self.authorization_service.check_tokens(body.tokens)
+
+        return JSONResponse(
+            status_code=200,
+            content=CheckAuthorizationBatchResponse(
+                results=[_check_authorization_response(result) for result in results]
+            ).model_dump(),
+        )
+
     @auto_log()
     @traced_method()
     async def refresh_token(self, request: Request):
@@ -196,3 +286,56 @@ class AuthorizationController(interface.IAuthorizationController):
                 status_code=403,
                 content={"message": "token invalid"}
             )
+
+    @auto_log()
+    @traced_method()
+    async def public_keys(self):
+        keys = await self.authorization_service.public_keys()
+
+        return JSONResponse(
+            status_code=200,
+            content=PublicKeysResponse(keys=keys).model_dump(),
+            headers={"Cache-Control": "public, max-age=300"},
+        )
+
+
+def _check_authorization_response(result: model.TokenPayload | Exception) -> CheckAuthorizationResponse:
+    if isinstance(result, model.TokenPayload):
+        return CheckAuthorizationResponse(
+            account_id=result.account_id,
+            two_fa_status=result.two_fa_status,
+            role=result.role,
+            message="Access-Token verified",
+            status_code=200
+        )
+
+    if isinstance(result, jwt.ExpiredSignatureError):
+        message = "token expired"
+    else:
+        message = "token invalid"
+
+    return CheckAuthorizationResponse(
+        account_id=-1,
+        two_fa_status=False,
+        role="",
+        message=message,
+        status_code=403
+    )
+
+
+def _forward_auth_error(status_code: int, message: str) -> Response:
+    return Response(
+        status_code=status_code,
+        headers={
+            "X-Auth-Error": message,
+            "Cache-Control": "no-store",
+        },
+    )
+
+
+token_expired_body = JSONResponse(
+    content=_check_authorization_response(jwt.ExpiredSignatureError()).model_dump()
+).body
+token_invalid_body = JSONResponse(
+    content=_check_authorization_response(jwt.InvalidTokenError()).model_dump()
+).body
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 class AuthorizationBody(BaseModel):
     account_id: int
@@ -14,4 +14,13 @@ class CheckAuthorizationResponse(BaseModel):
     two_fa_status: bool
     role: str
     message: str
-    status_code: int
\ No newline at end of file
+    status_code: int
+
+class CheckAuthorizationBatchBody(BaseModel):
+    tokens: list[str] = Field(max_length=1000)
+
+class CheckAuthorizationBatchResponse(BaseModel):
+    results: list[CheckAuthorizationResponse]
+
+class PublicKeysResponse(BaseModel):
+    keys: list[dict]
@@ -1,9 +1,13 @@
+import time
 from contextvars import ContextVar
-from typing import Callable
-from fastapi import FastAPI, Request
+from typing import Iterable, Optional
+from fastapi import FastAPI
 from fastapi.responses import JSONResponse
+from starlette.requests import cookie_parser
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from opentelemetry import propagate
+from opentelemetry.propagators.textmap import Getter
 from opentelemetry.semconv.trace import SpanAttributes
 from opentelemetry.trace import SpanKind, Status, StatusCode
 
@@ -23,72 +27,211 @@ class HttpMiddleware(interface.IHttpMiddleware):
         self.prefix = prefix
         self.log_context = log_context
 
+        # RED метрики по маршруту, методу и статусу. Записываются внутри серверного span,
+        # поэтому к гистограмме длительности прикрепляются exemplars с trace_id
+        self.request_duration = self.meter.create_histogram(
+            common.HTTP_REQUEST_DURATION_KEY,
+            unit="s",
+            description="Длительность обработки HTTP запроса",
+            explicit_bucket_boundaries_advisory=common.DURATION_BUCKETS,
+        )
+        self.requests = self.meter.create_counter(
+            common.HTTP_REQUESTS_KEY,
+            description="Обработанные HTTP запросы",
+        )
+        self.request_errors = self.meter.create_counter(
+            common.HTTP_REQUEST_ERRORS_KEY,
+            description="HTTP запросы, завершившиеся ответом 5xx",
+        )
+
     def trace_middleware01(self, app: FastAPI):
-        @app.middleware("http")
-        async def _trace_middleware01(request: Request, call_next: Callable):
-            if self.prefix not in request.url.path:
-                return JSONResponse(
-                    status_code=404,
-                    content={"error": "not found"}
-                )
-            with self.tracer.start_as_current_span(
-                    f"{request.method} {request.url.path}",
-                    context=propagate.extract(dict(request.headers)),
-                    kind=SpanKind.SERVER,
-                    attributes={
-                        SpanAttributes.HTTP_ROUTE: str(request.url.path),
-                        SpanAttributes.HTTP_METHOD: request.method,
-                    }
-            ) as root_span:
-                try:
-                    response = await call_next(request)
-
-                    status_code = response.status_code
-                    response_size = response.headers.get("content-length")
-
-                    root_span.set_attributes({
-                        SpanAttributes.HTTP_STATUS_CODE: status_code,
-                    })
-
-                    if response_size:
-                        try:
-                            root_span.set_attribute(SpanAttributes.HTTP_RESPONSE_BODY_SIZE, int(response_size))
-                        except ValueError:
-                            pass
-
-                    root_span.set_status(Status(StatusCode.OK))
-
-                    return response
-
-                except Exception as err:
-                    root_span.set_status(StatusCode.ERROR, str(err))
-                    return JSONResponse(
-                        status_code=500,
-                        content={"message": "Internal Server Error"},
-                    )
-
-        return _trace_middleware01
+        app.add_middleware(TraceMiddleware, http_middleware=self)
+        return TraceMiddleware
 
     def logger_middleware02(self, app: FastAPI):
-        @app.middleware("http")
-        async def _logger_middleware02(request: Request, call_next: Callable):
-            context_token = self.log_context.set({
-                common.TELEGRAM_USER_USERNAME_KEY: request.headers.get(common.TELEGRAM_USER_USERNAME_KEY, ""),
-                common.TELEGRAM_CHAT_ID_KEY: request.headers.get(common.TELEGRAM_CHAT_ID_KEY, "0"),
-                common.TELEGRAM_EVENT_TYPE_KEY: request.headers.get(common.TELEGRAM_EVENT_TYPE_KEY, ""),
-                common.ORGANIZATION_ID_KEY: request.headers.get(common.ORGANIZATION_ID_KEY, "0"),
-                common.ACCOUNT_ID_KEY: request.headers.get(common.ACCOUNT_ID_KEY, "0"),
-            })
+        app.add_middleware(LoggerMiddleware, http_middleware=self)
+        return LoggerMiddleware
+
+
+class TraceMiddleware:
+    def __init__(self, app: ASGIApp, http_middleware: HttpMiddleware):
+        self.app = app
+        self.http_middleware = http_middleware
+        self.tracer = http_middleware.tracer
+        self.prefix = http_middleware.prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        method = scope["method"]
+
+        if self.prefix not in path:
+            response = JSONResponse(
+                status_code=404,
+                content={"error": "not found"}
+            )
+            await response(scope, receive, send)
+            return
+
+        with self.tracer.start_as_current_span(
+                f"{method} {path}",
+                context=propagate.extract(scope["headers"], getter=asgi_header_getter),
+                kind=SpanKind.SERVER,
+                attributes={
+                    SpanAttributes.HTTP_ROUTE: path,
+                    SpanAttributes.HTTP_METHOD: method,
+                }
+        ) as root_span:
+            response_start: dict = {}
+            start = time.perf_counter()
+
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    response_start.update(message)
+                await send(message)
+
             try:
-                response = await call_next(request)
+                await self.app(scope, receive, send_wrapper)
 
-                status_code = response.status_code
+                root_span.set_attributes({
+                    SpanAttributes.HTTP_STATUS_CODE: response_start.get("status", 500),
+                })
 
-                if 400 <= status_code < 500:
-                    self.logger.warning("Обработка HTTP запроса завершена с ошибкой клиента")
+                response_size = _header(response_start.get("headers", ()), b"content-length")
+                if response_size:
+                    try:
+                        root_span.set_attribute(SpanAttributes.HTTP_RESPONSE_BODY_SIZE, int(response_size))
+                    except ValueError:
+                        pass
 
-                return response
-            finally:
-                self.log_context.reset(context_token)
+                root_span.set_status(Status(StatusCode.OK))
 
-        return _logger_middleware02
\ No newline at end of file
+            except Exception as err:
+                root_span.set_status(StatusCode.ERROR, str(err))
+                if response_start:
+                    raise
+
+                response = JSONResponse(
+                    status_code=500,
+                    content={"message": "Internal Server Error"},
+                )
+                await response(scope, receive, send)
+            finally:
+                self._record(scope, method, response_start.get("status", 500), time.perf_counter() - start)
+
+    def _record(self, scope: Scope, method: str, status: int, duration: float) -> None:
+        # Шаблон маршрута вместо пути: /check/{id} не размножает метрики по значениям параметров
+        route = scope.get("route")
+        if route is not None:
+            route_path = route.path
+        elif status != 404:
+            # Маршруты в обход роутинга FastAPI (быстрый /check) имеют фиксированный путь
+            route_path = scope["path"]
+        else:
+            route_path = "unmatched"
+
+        attributes = {
+            common.HTTP_ROUTE_KEY: route_path,
+            common.HTTP_METHOD_KEY: method,
+            common.HTTP_STATUS_KEY: status,
+        }
+        self.http_middleware.request_duration.record(duration, attributes)
+        self.http_middleware.requests.add(1, attributes)
+        if status >= 500:
+            self.http_middleware.request_errors.add(1, attributes)
+
+
+class LoggerMiddleware:
+    log_context_headers = {
+        common.TELEGRAM_USER_USERNAME_KEY: "",
+        common.TELEGRAM_CHAT_ID_KEY: "0",
+        common.TELEGRAM_EVENT_TYPE_KEY: "",
+        common.ORGANIZATION_ID_KEY: "0",
+        common.ACCOUNT_ID_KEY: "0",
+    }
+
+    def __init__(self, app: ASGIApp, http_middleware: HttpMiddleware):
+        self.app = app
+        self.logger = http_middleware.logger
+        self.log_context = http_middleware.log_context
+        self._header_keys = {key.encode("latin-1"): key for key in self.log_context_headers}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        log_context = dict(self.log_context_headers)
+        for name, value in scope["headers"]:
+            key = self._header_keys.get(name)
+            if key is not None:
+                log_context[key] = value.decode("latin-1")
+
+        context_token = self.log_context.set(log_context)
+        try:
+            status_code = 0
+
+            async def send_wrapper(message: Message) -> None:
+                nonlocal status_code
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
+            if 400 <= status_code < 500:
+                self.logger.warning("Обработка HTTP запроса завершена с ошибкой клиента")
+        finally:
+            self.log_context.reset(context_token)
+
+
+class CheckFastPathMiddleware:
+    """Отвечает на GET {prefix}/check в обход роутинга FastAPI. Ставится внутрь TraceMiddleware и LoggerMiddleware."""
+
+    def __init__(self, app: ASGIApp, authorization_controller: interface.IAuthorizationController, path: str):
+        self.app = app
+        self.authorization_controller = authorization_controller
+        self.path = path
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "GET" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+
+        cookie = _header(scope["headers"], b"cookie")
+        access_token = cookie_parser(cookie.decode("latin-1")).get("Access-Token") if cookie else None
+
+        body = await self.authorization_controller.check_authorization_fast(access_token)
+
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+class AsgiHeaderGetter(Getter[list]):
+    def get(self, carrier: list, key: str) -> Optional[list[str]]:
+        name = key.lower().encode("latin-1")
+        values = [value.decode("latin-1") for header, value in carrier if header == name]
+        return values or None
+
+    def keys(self, carrier: list) -> list[str]:
+        return [header.decode("latin-1") for header, _ in carrier]
+
+
+asgi_header_getter = AsgiHeaderGetter()
+
+
+def _header(headers: Iterable[tuple[bytes, bytes]], name: bytes) -> Optional[bytes]:
+    for header, value in headers:
+        if header.lower() == name:
+            return value
+    return None
@@ -1,4 +1,5 @@
 from abc import abstractmethod
+from contextlib import AbstractAsyncContextManager
 from typing import Protocol
 from fastapi import Request
 
@@ -17,12 +18,24 @@ class IAuthorizationController(Protocol):
     @abstractmethod
     async def check_authorization(self, request: Request): pass
 
+    @abstractmethod
+    async def check_authorization_fast(self, token: str) -> bytes: pass
+
+    @abstractmethod
+    async def check_authorization_batch(self, body: CheckAuthorizationBatchBody): pass
+
+    @abstractmethod
+    async def forward_auth(self, request: Request): pass
+
     @abstractmethod
     async def refresh_token(self, request: Request): pass
 
     @abstractmethod
     async def refresh_token_tg(self, request: Request): pass
 
+    @abstractmethod
+    async def public_keys(self): pass
+
 
 class IAuthorizationService(Protocol):
     @abstractmethod
@@ -44,22 +57,58 @@ class IAuthorizationService(Protocol):
     @abstractmethod
     async def check_token(self, token: str) -> model.TokenPayload: pass
 
+    @abstractmethod
+    async def check_tokens(self, tokens: list[str]) -> list[model.TokenPayload | Exception]: pass
+
     @abstractmethod
     async def refresh_token(self, refresh_token: str) -> model.JWTToken: pass
 
     @abstractmethod
     async def refresh_token_tg(self, refresh_token: str) -> model.JWTToken: pass
 
+    @abstractmethod
+    async def public_keys(self) -> list[dict]: pass
+
+    @abstractmethod
+    async def sweep_expired_sessions(self, batch_size: int) -> int: pass
+
+    @abstractmethod
+    async def run_session_sweeper(self, interval: float, batch_size: int) -> None: pass
+
 
 class IAuthorizationRepo(Protocol):
     @abstractmethod
-    async def create_account(self, account_id: int) -> None: pass
+    def transaction(self) -> AbstractAsyncContextManager[None]: pass
+
+    @abstractmethod
+    async def create_session(
+            self,
+            account_id: int,
+            refresh_token: str,
+            two_fa_status: bool,
+            role: str,
+            expires_at: int,
+    ) -> int: pass
+
+    @abstractmethod
+    async def create_sessions(self, account_id: int, sessions: list[model.NewSession]) -> list[int]: pass
+
+    @abstractmethod
+    async def session_by_refresh_token(self, refresh_token: str) -> list[model.Session]: pass
 
     @abstractmethod
-    async def account_by_id(self, account_id: int) -> list[model.Account]: pass
+    async def rotate_session(
+            self,
+            session_id: int,
+            old_refresh_token: str,
+            refresh_token: str,
+            two_fa_status: bool,
+            role: str,
+            expires_at: int,
+    ) -> bool: pass
 
     @abstractmethod
-    async def account_by_refresh_token(self, refresh_token: str) -> list[model.Account]: pass
+    async def delete_expired_sessions(self, now: int, batch_size: int) -> int: pass
 
     @abstractmethod
-    async def update_refresh_token(self, account_id: int, refresh_token: str) -> None: pass
+    async def close(self) -> None: pass
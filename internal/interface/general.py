@@ -1,4 +1,5 @@
 from abc import abstractmethod
+from contextlib import AbstractAsyncContextManager
 from typing import Protocol, Sequence, Any
 
 from fastapi import FastAPI
@@ -57,11 +58,14 @@ class IRedis(Protocol):
 
 class IDB(Protocol):
 
+    @abstractmethod
+    def transaction(self) -> AbstractAsyncContextManager[None]: pass
+
     @abstractmethod
     async def insert(self, query: str, query_params: dict) -> int: pass
 
     @abstractmethod
-    async def delete(self, query: str, query_params: dict) -> None: pass
+    async def delete(self, query: str, query_params: dict) -> int: pass
 
     @abstractmethod
     async def update(self, query: str, query_params: dict) -> None: pass
@@ -71,3 +75,6 @@ class IDB(Protocol):
 
     @abstractmethod
     async def multi_query(self, queries: list[str]) -> None: pass
+
+    @abstractmethod
+    async def close(self) -> None: pass
@@ -74,7 +74,7 @@ class MigrationManager:
         try:
             rows = await self.db.select(
                 "SELECT version FROM migration_history ORDER BY version",
-                {}
+                {},
             )
             applied = {row[0] for row in rows}
             print(f"📊 MigrationManager: Применённые версии: {applied if applied else 'нет'}", flush=True)
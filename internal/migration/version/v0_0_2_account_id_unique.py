@@ -0,0 +1,45 @@
+from internal import interface
+from internal.migration.base import Migration, MigrationInfo
+
+
+class AccountIdUniqueMigration(Migration):
+
+    def get_info(self) -> MigrationInfo:
+        return MigrationInfo(
+            version="v0_0_2",
+            name="account_id_unique",
+            depends_on="v0_0_1",
+        )
+
+    async def up(self, db: interface.IDB):
+        queries = [
+            delete_duplicate_accounts,
+            add_account_id_unique_constraint,
+        ]
+
+        await db.multi_query(queries)
+
+    async def down(self, db: interface.IDB):
+        queries = [
+            drop_account_id_unique_constraint
+        ]
+
+        await db.multi_query(queries)
+
+# Оставляем самую раннюю запись для каждого account_id, иначе UNIQUE не создастся
+delete_duplicate_accounts = """
+DELETE FROM accounts a
+USING accounts b
+WHERE a.account_id = b.account_id
+  AND a.id > b.id;
+"""
+
+add_account_id_unique_constraint = """
+ALTER TABLE accounts
+ADD CONSTRAINT accounts_account_id_key UNIQUE (account_id);
+"""
+
+drop_account_id_unique_constraint = """
+ALTER TABLE accounts
+DROP CONSTRAINT IF EXISTS accounts_account_id_key;
+"""
@@ -0,0 +1,58 @@
+from internal import interface
+from internal.migration.base import Migration, MigrationInfo
+
+
+class RefreshTokenHashMigration(Migration):
+
+    def get_info(self) -> MigrationInfo:
+        return MigrationInfo(
+            version="v0_0_3",
+            name="refresh_token_hash",
+            depends_on="v0_0_2",
+        )
+
+    async def up(self, db: interface.IDB):
+        queries = [
+            add_refresh_token_hash_column,
+            backfill_refresh_token_hash,
+            create_refresh_token_hash_index,
+        ]
+
+        await db.multi_query(queries)
+
+    async def down(self, db: interface.IDB):
+        queries = [
+            drop_refresh_token_hash_index,
+            drop_refresh_token_hash_column,
+        ]
+
+        await db.multi_query(queries)
+
+add_refresh_token_hash_column = """
+ALTER TABLE accounts
+ADD COLUMN IF NOT EXISTS refresh_token_hash BYTEA;
+"""
+
+# Хэш считается так же, как в AccountRepo: sha256 от UTF-8 байт токена
+backfill_refresh_token_hash = """
+UPDATE accounts
+SET refresh_token_hash = sha256(convert_to(refresh_token, 'UTF8'))
+WHERE refresh_token IS NOT NULL
+  AND refresh_token <> ''
+  AND refresh_token_hash IS NULL;
+"""
+
+create_refresh_token_hash_index = """
+CREATE UNIQUE INDEX IF NOT EXISTS accounts_refresh_token_hash_idx
+ON accounts (refresh_token_hash)
+WHERE refresh_token_hash IS NOT NULL;
+"""
+
+drop_refresh_token_hash_index = """
+DROP INDEX IF EXISTS accounts_refresh_token_hash_idx;
+"""
+
+drop_refresh_token_hash_column = """
+ALTER TABLE accounts
+DROP COLUMN IF EXISTS refresh_token_hash;
+"""
@@ -0,0 +1,41 @@
+from internal import interface
+from internal.migration.base import Migration, MigrationInfo
+
+
+class RefreshTokenClaimsMigration(Migration):
+
+    def get_info(self) -> MigrationInfo:
+        return MigrationInfo(
+            version="v0_0_4",
+            name="refresh_token_claims",
+            depends_on="v0_0_3",
+        )
+
+    async def up(self, db: interface.IDB):
+        queries = [
+            add_refresh_token_claims_columns
+        ]
+
+        await db.multi_query(queries)
+
+    async def down(self, db: interface.IDB):
+        queries = [
+            drop_refresh_token_claims_columns
+        ]
+
+        await db.multi_query(queries)
+
+# Claims непрозрачных refresh токенов хранятся на сервере
+add_refresh_token_claims_columns = """
+ALTER TABLE accounts
+ADD COLUMN IF NOT EXISTS refresh_token_two_fa_status BOOLEAN DEFAULT FALSE,
+ADD COLUMN IF NOT EXISTS refresh_token_role TEXT DEFAULT '',
+ADD COLUMN IF NOT EXISTS refresh_token_exp BIGINT DEFAULT 0;
+"""
+
+drop_refresh_token_claims_columns = """
+ALTER TABLE accounts
+DROP COLUMN IF EXISTS refresh_token_two_fa_status,
+DROP COLUMN IF EXISTS refresh_token_role,
+DROP COLUMN IF EXISTS refresh_token_exp;
+"""
@@ -0,0 +1,78 @@
+from internal import interface
+from internal.migration.base import Migration, MigrationInfo
+
+
+class SessionsMigration(Migration):
+
+    def get_info(self) -> MigrationInfo:
+        return MigrationInfo(
+            version="v0_0_5",
+            name="sessions",
+            depends_on="v0_0_4",
+        )
+
+    async def up(self, db: interface.IDB):
+        queries = [
+            create_session_table,
+            create_session_refresh_token_hash_index,
+            create_session_account_id_index,
+            create_session_expires_at_index,
+            backfill_sessions,
+        ]
+
+        await db.multi_query(queries)
+
+    async def down(self, db: interface.IDB):
+        queries = [
+            drop_session_table
+        ]
+
+        await db.multi_query(queries)
+
+create_session_table = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id BIGSERIAL PRIMARY KEY,
+    
+    account_id INTEGER NOT NULL,
+    refresh_token_hash BYTEA NOT NULL,
+    two_fa_status BOOLEAN NOT NULL DEFAULT FALSE,
+    role TEXT NOT NULL DEFAULT '',
+    expires_at BIGINT NOT NULL,
+    
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+create_session_refresh_token_hash_index = """
+CREATE UNIQUE INDEX IF NOT EXISTS sessions_refresh_token_hash_idx ON sessions (refresh_token_hash);
+"""
+
+create_session_account_id_index = """
+CREATE INDEX IF NOT EXISTS sessions_account_id_idx ON sessions (account_id);
+"""
+
+create_session_expires_at_index = """
+CREATE INDEX IF NOT EXISTS sessions_expires_at_idx ON sessions (expires_at);
+"""
+
+# Текущие refresh токены из accounts переносятся в сессии. Для JWT токенов, выпущенных
+# до v0_0_4, срок неизвестен - берется максимальный (как у /tg), JWT все равно проверит exp.
+backfill_sessions = """
+INSERT INTO sessions (account_id, refresh_token_hash, two_fa_status, role, expires_at)
+SELECT
+    account_id,
+    refresh_token_hash,
+    COALESCE(refresh_token_two_fa_status, FALSE),
+    COALESCE(refresh_token_role, ''),
+    CASE
+        WHEN refresh_token_exp > 0 THEN refresh_token_exp
+        ELSE EXTRACT(EPOCH FROM NOW())::BIGINT + 24 * 365 * 10 * 60
+    END
+FROM accounts
+WHERE refresh_token_hash IS NOT NULL
+ON CONFLICT (refresh_token_hash) DO NOTHING;
+"""
+
+drop_session_table = """
+DROP TABLE IF EXISTS sessions;
+"""
@@ -0,0 +1,58 @@
+from internal import interface
+from internal.migration.base import Migration, MigrationInfo
+
+
+class DropAccountRefreshTokenMigration(Migration):
+
+    def get_info(self) -> MigrationInfo:
+        return MigrationInfo(
+            version="v0_0_6",
+            name="drop_account_refresh_token",
+            depends_on="v0_0_5",
+        )
+
+    async def up(self, db: interface.IDB):
+        queries = [
+            drop_refresh_token_hash_index,
+            drop_refresh_token_columns,
+        ]
+
+        await db.multi_query(queries)
+
+    async def down(self, db: interface.IDB):
+        queries = [
+            add_refresh_token_columns,
+            create_refresh_token_hash_index,
+        ]
+
+        await db.multi_query(queries)
+
+# Refresh токены хранятся в sessions с v0_0_5, колонки accounts больше не пишутся и не читаются.
+# Откат возвращает пустые колонки: токены остаются в sessions
+drop_refresh_token_hash_index = """
+DROP INDEX IF EXISTS accounts_refresh_token_hash_idx;
+"""
+
+drop_refresh_token_columns = """
+ALTER TABLE accounts
+DROP COLUMN IF EXISTS refresh_token,
+DROP COLUMN IF EXISTS refresh_token_hash,
+DROP COLUMN IF EXISTS refresh_token_two_fa_status,
+DROP COLUMN IF EXISTS refresh_token_role,
+DROP COLUMN IF EXISTS refresh_token_exp;
+"""
+
+add_refresh_token_columns = """
+ALTER TABLE accounts
+ADD COLUMN IF NOT EXISTS refresh_token TEXT DEFAULT '',
+ADD COLUMN IF NOT EXISTS refresh_token_hash BYTEA,
+ADD COLUMN IF NOT EXISTS refresh_token_two_fa_status BOOLEAN DEFAULT FALSE,
+ADD COLUMN IF NOT EXISTS refresh_token_role TEXT DEFAULT '',
+ADD COLUMN IF NOT EXISTS refresh_token_exp BIGINT DEFAULT 0;
+"""
+
+create_refresh_token_hash_index = """
+CREATE UNIQUE INDEX IF NOT EXISTS accounts_refresh_token_hash_idx
+ON accounts (refresh_token_hash)
+WHERE refresh_token_hash IS NOT NULL;
+"""
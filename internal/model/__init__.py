@@ -1,2 +1,3 @@
 from internal.model.sql_model import *
-from internal.model.account import *
\ No newline at end of file
+from internal.model.account import *
+from internal.model.session import *
\ No newline at end of file
@@ -7,7 +7,6 @@ class Account:
     id: int
 
     account_id: int
-    refresh_token: str
 
     created_at: datetime
 
@@ -17,7 +16,6 @@ class Account:
             cls(
                 id=row.id,
                 account_id=row.account_id,
-                refresh_token=row.refresh_token,
                 created_at=row.created_at,
             ) for row in rows
         ]
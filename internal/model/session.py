@@ -0,0 +1,35 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+
+@dataclass
+class NewSession:
+    refresh_token: str
+    two_fa_status: bool
+    role: str
+    expires_at: int
+
+
+@dataclass
+class Session:
+    id: int
+
+    account_id: int
+    two_fa_status: bool
+    role: str
+    expires_at: int
+
+    created_at: datetime
+
+    @classmethod
+    def serialize(cls, rows):
+        return [
+            cls(
+                id=row.id,
+                account_id=row.account_id,
+                two_fa_status=row.two_fa_status,
+                role=row.role,
+                expires_at=row.expires_at,
+                created_at=row.created_at,
+            ) for row in rows
+        ]
@@ -2,16 +2,51 @@ create_account_table = """
 CREATE TABLE IF NOT EXISTS accounts (
     id SERIAL PRIMARY KEY,
     
+    account_id INTEGER NOT NULL UNIQUE,
+    
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+create_session_table = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id BIGSERIAL PRIMARY KEY,
+    
     account_id INTEGER NOT NULL,
-    refresh_token TEXT DEFAULT '',
+    refresh_token_hash BYTEA NOT NULL,
+    two_fa_status BOOLEAN NOT NULL DEFAULT FALSE,
+    role TEXT NOT NULL DEFAULT '',
+    expires_at BIGINT NOT NULL,
     
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 """
 
+create_session_refresh_token_hash_index = """
+CREATE UNIQUE INDEX IF NOT EXISTS sessions_refresh_token_hash_idx ON sessions (refresh_token_hash);
+"""
+
+create_session_account_id_index = """
+CREATE INDEX IF NOT EXISTS sessions_account_id_idx ON sessions (account_id);
+"""
+
+create_session_expires_at_index = """
+CREATE INDEX IF NOT EXISTS sessions_expires_at_idx ON sessions (expires_at);
+"""
+
+drop_session_table = """
+DROP TABLE IF EXISTS sessions;
+"""
+
 drop_account_table = """
 DROP TABLE IF EXISTS accounts;
 """
 
-create_queries = [create_account_table]
-drop_queries = [drop_account_table]
\ No newline at end of file
+create_queries = [
+    create_account_table,
+    create_session_table,
+    create_session_refresh_token_hash_index,
+    create_session_account_id_index,
+    create_session_expires_at_index,
+]
+drop_queries = [drop_session_table, drop_account_table]
@@ -1,41 +1,140 @@
+import hashlib
+from contextlib import AbstractAsyncContextManager, nullcontext
+
 from .sql_query import *
 from internal import model, interface
 
 from pkg.trace_wrapper import traced_method
+from pkg.write_behind import WriteBehindBuffer
 
 
 class AccountRepo(interface.IAuthorizationRepo):
-    def __init__(self, tel: interface.ITelemetry, db: interface.IDB):
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            db: interface.IDB,
+            write_behind: bool = False,
+            write_behind_max_size: int = 500,
+            write_behind_max_delay: float = 0.005,
+    ):
         self.db = db
         self.tracer = tel.tracer()
 
+        # Ротации сессий копятся несколько миллисекунд и пишутся одним UPDATE ... FROM unnest(...)
+        self.rotate_session_buffer = WriteBehindBuffer(
+            self._rotate_sessions_batch,
+            max_size=write_behind_max_size,
+            max_delay=write_behind_max_delay,
+        ) if write_behind else None
+
+    def transaction(self) -> AbstractAsyncContextManager[None]:
+        if self.rotate_session_buffer is not None:
+            # Ротация подтверждается flush-ем пачки в отдельном соединении; держать транзакцию
+            # открытой на время ожидания пачки значит занимать соединение пула впустую.
+            # Без транзакции FOR UPDATE не держит строку: от повторного обмена токена защищает
+            # compare-and-swap по старому хэшу в rotate_sessions_batch
+            return nullcontext()
+        return self.db.transaction()
+
+    @traced_method()
+    async def create_session(
+            self,
+            account_id: int,
+            refresh_token: str,
+            two_fa_status: bool,
+            role: str,
+            expires_at: int,
+    ) -> int:
+        session_ids = await self.create_sessions(
+            account_id,
+            [model.NewSession(refresh_token, two_fa_status, role, expires_at)],
+        )
+        return session_ids[0]
+
     @traced_method()
-    async def create_account(self, account_id: int) -> None:
+    async def create_sessions(self, account_id: int, sessions: list[model.NewSession]) -> list[int]:
+        refresh_token_hashes = [refresh_token_digest(session.refresh_token) for session in sessions]
         args = {
             'account_id': account_id,
+            'refresh_token_hashes': refresh_token_hashes,
+            'two_fa_statuses': [session.two_fa_status for session in sessions],
+            'roles': [session.role for session in sessions],
+            'expires_ats': [session.expires_at for session in sessions],
         }
-        await self.db.insert(create_account, args)
+        # INSERT ... RETURNING через select: транзакция фиксирует запись
+        async with self.db.transaction():
+            rows = await self.db.select(create_sessions, args)
+
+        # Порядок RETURNING не гарантирован, сессии сопоставляются по уникальному хэшу
+        session_ids = {bytes(row[1]): row[0] for row in rows}
+        return [session_ids[refresh_token_hash] for refresh_token_hash in refresh_token_hashes]
 
     @traced_method()
-    async def account_by_id(self, account_id: int) -> list[model.Account]:
-        args = {'account_id': account_id}
-        rows = await self.db.select(account_by_id, args)
-        accounts = model.Account.serialize(rows) if rows else []
+    async def session_by_refresh_token(self, refresh_token: str) -> list[model.Session]:
+        args = {'refresh_token_hash': refresh_token_digest(refresh_token)}
+        rows = await self.db.select(session_by_refresh_token, args)
+        sessions = model.Session.serialize(rows) if rows else []
 
-        return accounts
+        return sessions
 
     @traced_method()
-    async def account_by_refresh_token(self, refresh_token: str) -> list[model.Account]:
-        args = {'refresh_token': refresh_token}
-        rows = await self.db.select(account_by_refresh_token, args)
-        accounts = model.Account.serialize(rows) if rows else []
+    async def rotate_session(
+            self,
+            session_id: int,
+            old_refresh_token: str,
+            refresh_token: str,
+            two_fa_status: bool,
+            role: str,
+            expires_at: int,
+    ) -> bool:
+        # False - сессию уже ротировали по этому токену, новый токен не сохранен
+        args = {
+            'session_id': session_id,
+            'old_refresh_token_hash': refresh_token_digest(old_refresh_token),
+            'refresh_token_hash': refresh_token_digest(refresh_token),
+            'two_fa_status': two_fa_status,
+            'role': role,
+            'expires_at': expires_at,
+        }
+        if self.rotate_session_buffer is not None:
+            return await self.rotate_session_buffer.write(args)
 
-        return accounts
+        async with self.db.transaction():
+            rows = await self.db.select(rotate_session, args)
+        return bool(rows)
 
     @traced_method()
-    async def update_refresh_token(self, account_id: int, refresh_token: str) -> None:
+    async def delete_expired_sessions(self, now: int, batch_size: int) -> int:
         args = {
-            'account_id': account_id,
-            'refresh_token': refresh_token,
+            'now': now,
+            'batch_size': batch_size,
+        }
+        return await self.db.delete(delete_expired_sessions, args)
+
+    async def close(self) -> None:
+        if self.rotate_session_buffer is not None:
+            await self.rotate_session_buffer.close()
+
+    async def _rotate_sessions_batch(self, rotations: list[dict]) -> list[bool]:
+        # Каждая ротация - compare-and-swap по старому хэшу. Если одну сессию ротировали дважды
+        # по одному токену, строку обновит только одна из них; RETURNING возвращает номера
+        # примененных ротаций, остальные вызывающие получают False
+        args = {
+            'session_ids': [rotation['session_id'] for rotation in rotations],
+            'old_refresh_token_hashes': [rotation['old_refresh_token_hash'] for rotation in rotations],
+            'refresh_token_hashes': [rotation['refresh_token_hash'] for rotation in rotations],
+            'two_fa_statuses': [rotation['two_fa_status'] for rotation in rotations],
+            'roles': [rotation['role'] for rotation in rotations],
+            'expires_ats': [rotation['expires_at'] for rotation in rotations],
         }
-        await self.db.update(update_refresh_token, args)
+        # UPDATE ... RETURNING через select: транзакция фиксирует запись
+        async with self.db.transaction():
+            rows = await self.db.select(rotate_sessions_batch, args)
+
+        applied = {row[0] for row in rows}
+        return [position in applied for position in range(1, len(rotations) + 1)]
+
+
+def refresh_token_digest(refresh_token: str) -> bytes:
+    # В БД хранится только sha256 от токена: 32 байта под уникальным индексом вместо полного JWT
+    return hashlib.sha256((refresh_token or "").encode("utf-8")).digest()
@@ -1,27 +1,81 @@
-create_account = """
-INSERT INTO accounts (
-    account_id,
-    refresh_token
+# Аккаунт создается в том же запросе, если его еще нет; сессии одного аккаунта вставляются пачкой
+create_sessions = """
+-- name: create_sessions
+WITH account AS (
+    INSERT INTO accounts (account_id)
+    VALUES (:account_id)
+    ON CONFLICT (account_id) DO NOTHING
 )
-VALUES (
-    :account_id,
-    ''
+INSERT INTO sessions (
+    account_id,
+    refresh_token_hash,
+    two_fa_status,
+    role,
+    expires_at
 )
-RETURNING id;
+SELECT
+    CAST(:account_id AS INTEGER),
+    batch.refresh_token_hash,
+    batch.two_fa_status,
+    batch.role,
+    batch.expires_at
+FROM unnest(
+    CAST(:refresh_token_hashes AS BYTEA[]),
+    CAST(:two_fa_statuses AS BOOLEAN[]),
+    CAST(:roles AS TEXT[]),
+    CAST(:expires_ats AS BIGINT[])
+) AS batch(refresh_token_hash, two_fa_status, role, expires_at)
+RETURNING id, refresh_token_hash;
 """
 
-account_by_id = """
-SELECT * FROM accounts
-WHERE account_id = :account_id;
+session_by_refresh_token = """
+-- name: session_by_refresh_token
+SELECT * FROM sessions
+WHERE refresh_token_hash = :refresh_token_hash
+FOR UPDATE;
 """
 
-account_by_refresh_token = """
-SELECT * FROM accounts
-WHERE refresh_token = :refresh_token;
+# Ротация - compare-and-swap по старому хэшу: токен, уже обмененный параллельным запросом, не обновит строку
+rotate_session = """
+-- name: rotate_session
+UPDATE sessions
+SET refresh_token_hash = :refresh_token_hash,
+    two_fa_status = :two_fa_status,
+    role = :role,
+    expires_at = :expires_at
+WHERE id = :session_id
+  AND refresh_token_hash = :old_refresh_token_hash
+RETURNING id;
 """
 
-update_refresh_token = """
-UPDATE accounts
-SET refresh_token = :refresh_token
-WHERE account_id = :account_id;
-"""
\ No newline at end of file
+rotate_sessions_batch = """
+-- name: rotate_sessions_batch
+UPDATE sessions
+SET refresh_token_hash = batch.refresh_token_hash,
+    two_fa_status = batch.two_fa_status,
+    role = batch.role,
+    expires_at = batch.expires_at
+FROM unnest(
+    CAST(:session_ids AS BIGINT[]),
+    CAST(:old_refresh_token_hashes AS BYTEA[]),
+    CAST(:refresh_token_hashes AS BYTEA[]),
+    CAST(:two_fa_statuses AS BOOLEAN[]),
+    CAST(:roles AS TEXT[]),
+    CAST(:expires_ats AS BIGINT[])
+) WITH ORDINALITY AS batch(session_id, old_refresh_token_hash, refresh_token_hash, two_fa_status, role, expires_at, position)
+WHERE sessions.id = batch.session_id
+  AND sessions.refresh_token_hash = batch.old_refresh_token_hash
+RETURNING batch.position;
+"""
+
+delete_expired_sessions = """
+-- name: delete_expired_sessions
+DELETE FROM sessions
+WHERE id IN (
+    SELECT id FROM sessions
+    WHERE expires_at < :now
+    ORDER BY expires_at
+    LIMIT :batch_size
+    FOR UPDATE SKIP LOCKED
+);
+"""
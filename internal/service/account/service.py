@@ -1,10 +1,16 @@
 import asyncio
+import hashlib
+import random
+import secrets
 
 import jwt
 import time
+from cryptography.hazmat.primitives import serialization
 
 from internal import interface, common, model
+from pkg.single_flight import SingleFlightBatch
 from pkg.trace_wrapper import traced_method
+from pkg.ttl_cache import TTLCache
 
 
 class AuthorizationService(interface.IAuthorizationService):
@@ -13,11 +19,69 @@ class AuthorizationService(interface.IAuthorizationService):
             tel: interface.ITelemetry,
             authorization_repo: interface.IAuthorizationRepo,
             jwt_secret_key: str,
+            jwt_algorithm: str = "HS256",
+            jwt_private_key: str = "",
+            jwt_key_id: str = "",
+            token_cache_size: int = 10000,
+            opaque_refresh_token: bool = False,
+            opaque_refresh_token_tg: bool = False,
     ):
         self.tracer = tel.tracer()
         self.logger = tel.logger()
+        self.meter = tel.meter()
         self.authorization_repo = authorization_repo
         self.jwt_secret_key = jwt_secret_key
+        self.jwt_algorithm = jwt_algorithm
+
+        # Непрозрачные refresh токены: случайные байты, claims хранятся в БД
+        self.opaque_refresh_token = opaque_refresh_token
+        self.opaque_refresh_token_tg = opaque_refresh_token_tg
+
+        # kid -> (публичный ключ, алгоритм) для проверки асимметрично подписанных токенов
+        self.verification_keys: dict = {}
+        self.jwt_headers = None
+        self.signing_key = jwt_secret_key
+
+        if jwt_algorithm != "HS256":
+            self.signing_key = serialization.load_pem_private_key(jwt_private_key.encode(), password=None)
+            public_key = self.signing_key.public_key()
+            if not jwt_key_id:
+                jwt_key_id = _key_thumbprint(public_key)
+
+            self.jwt_headers = {"kid": jwt_key_id}
+            self.verification_keys[jwt_key_id] = (public_key, jwt_algorithm)
+
+        # Кэш уже проверенных токенов: запись живет до exp токена
+        self.token_cache_hits = self.meter.create_counter(
+            "authorization.token_cache.hits",
+            description="Проверки токена, обслуженные из кэша",
+        )
+        self.token_cache_misses = self.meter.create_counter(
+            "authorization.token_cache.misses",
+            description="Проверки токена с полным декодированием JWT",
+        )
+        self.token_cache_evictions = self.meter.create_counter(
+            "authorization.token_cache.evictions",
+            description="Вытеснения из кэша проверенных токенов",
+        )
+        self.token_cache = TTLCache(
+            token_cache_size,
+            on_evict=lambda reason: self.token_cache_evictions.add(1, {"reason": reason}),
+        )
+
+        # Одновременные входы в один аккаунт: токены и сессия у каждого устройства свои,
+        # а строки сессий, накопленные за время выполняющейся вставки, уходят одним INSERT
+        self.create_session_flight = SingleFlightBatch(self.authorization_repo.create_sessions)
+        self.create_session_coalesced = self.meter.create_counter(
+            "authorization.create_session.coalesced",
+            description="Создания сессии, объединенные с другими в один INSERT",
+        )
+
+        # outcome: issued | refreshed | expired | invalid | account_not_found
+        self.token_outcomes = self.meter.create_counter(
+            "authorization.token.outcomes",
+            description="Результаты выпуска, обновления и проверки токенов",
+        )
 
     @traced_method()
     async def create_tokens(
@@ -26,112 +90,274 @@ class AuthorizationService(interface.IAuthorizationService):
             two_fa_status: bool,
             role: str,
     ) -> model.JWTToken:
-        account = await self.authorization_repo.account_by_id(account_id)
-        if not account:
-            self.logger.info("Аккаунт не найден, создаем новый")
-            await self.authorization_repo.create_account(account_id)
+        return await self._create_tokens(
+            "web",
+            account_id,
+            two_fa_status,
+            role,
+            15 * 60,
+            self.opaque_refresh_token,
+        )
 
-            account = await self.authorization_repo.account_by_id(account_id)
-        account = account[0]
+    @traced_method()
+    async def create_tokens_tg(
+            self,
+            account_id: int,
+            two_fa_status: bool,
+            role: str,
+    ) -> model.JWTToken:
+        return await self._create_tokens(
+            "tg",
+            account_id,
+            two_fa_status,
+            role,
+            24 * 365 * 10 * 60,
+            self.opaque_refresh_token_tg,
+        )
 
-        access_token_payload = {
-            "account_id": account_id,
-            "two_fa_status": two_fa_status,
-            "role": role,
-            "exp": int(time.time()) + 15 * 60,
-        }
-        access_token = jwt.encode(access_token_payload, self.jwt_secret_key, algorithm="HS256")
+    async def _create_tokens(
+            self,
+            flow: str,
+            account_id: int,
+            two_fa_status: bool,
+            role: str,
+            refresh_token_ttl: int,
+            opaque_refresh_token: bool,
+    ) -> model.JWTToken:
+        jwt_token, refresh_token_exp = self._issue_tokens(
+            account_id,
+            two_fa_status,
+            role,
+            refresh_token_ttl,
+            opaque_refresh_token,
+        )
 
-        refresh_token_payload = {
-            "account_id": account_id,
-            "two_fa_status": two_fa_status,
-            "role": role,
-            "exp": int(time.time()) + 15 * 60,
-        }
-        refresh_token = jwt.encode(refresh_token_payload, self.jwt_secret_key, algorithm="HS256")
+        # Аккаунт и сессия создаются одним запросом. Пачка выполняется в отдельной задаче
+        # с пустым контекстом, вне транзакции вызывающего
+        _, coalesced = await self.create_session_flight.do(
+            account_id,
+            model.NewSession(jwt_token.refresh_token, two_fa_status, role, refresh_token_exp),
+        )
+        if coalesced:
+            self.create_session_coalesced.add(1, {"flow": flow})
+        self.token_outcomes.add(1, {"outcome": "issued"})
 
-        await self.authorization_repo.update_refresh_token(account.id, refresh_token)
+        return jwt_token
 
-        return model.JWTToken(access_token, refresh_token)
+    @traced_method()
+    async def check_token(self, token: str) -> model.TokenPayload:
+        return self._check_token(token)
 
     @traced_method()
-    async def create_tokens_tg(
+    async def check_tokens(self, tokens: list[str]) -> list[model.TokenPayload | Exception]:
+        # Одинаковые токены в пачке проверяются один раз
+        results: dict[str, model.TokenPayload | Exception] = {}
+        for token in tokens:
+            if token in results:
+                continue
+            try:
+                results[token] = self._check_token(token)
+            except jwt.InvalidTokenError as err:
+                results[token] = err
+
+        return [results[token] for token in tokens]
+
+    def _check_token(self, token: str) -> model.TokenPayload:
+        cache_key = hashlib.sha256(token.encode()).digest() if isinstance(token, str) else None
+        if cache_key is not None:
+            token_payload = self.token_cache.get(cache_key)
+            if token_payload is not None:
+                self.token_cache_hits.add(1)
+                return token_payload
+            self.token_cache_misses.add(1)
+
+        try:
+            payload = self._decode(token)
+        except jwt.ExpiredSignatureError:
+            self.token_outcomes.add(1, {"outcome": "expired"})
+            raise
+        except jwt.InvalidTokenError:
+            self.token_outcomes.add(1, {"outcome": "invalid"})
+            raise
+
+        token_payload = model.TokenPayload(
+            account_id=int(payload["account_id"]),
+            two_fa_status=bool(payload["two_fa_status"]),
+            role=payload["role"],
+            exp=int(payload["exp"]),
+        )
+
+        if cache_key is not None:
+            self.token_cache.set(cache_key, token_payload, token_payload.exp)
+
+        return token_payload
+
+    @traced_method()
+    async def refresh_token(self, refresh_token: str) -> model.JWTToken:
+        return await self._refresh_session(refresh_token, 15 * 60, self.opaque_refresh_token)
+
+    @traced_method()
+    async def refresh_token_tg(self, refresh_token: str) -> model.JWTToken:
+        return await self._refresh_session(refresh_token, 24 * 365 * 10 * 60, self.opaque_refresh_token_tg)
+
+    @traced_method()
+    async def sweep_expired_sessions(self, batch_size: int) -> int:
+        # Удаляем пачками, чтобы не держать длинную транзакцию и блокировки на всей таблице
+        deleted = 0
+        while True:
+            batch_deleted = await self.authorization_repo.delete_expired_sessions(int(time.time()), batch_size)
+            deleted += batch_deleted
+            if batch_deleted < batch_size:
+                return deleted
+
+    async def run_session_sweeper(self, interval: float, batch_size: int) -> None:
+        # Чистильщик запускается в каждом воркере: пачки разбираются через FOR UPDATE SKIP LOCKED,
+        # поэтому воркеры не удаляют одни и те же строки и не ждут друг друга.
+        # Случайный сдвиг первого запуска разносит воркеры по интервалу
+        await asyncio.sleep(random.uniform(0, interval))
+        while True:
+            try:
+                deleted = await self.sweep_expired_sessions(batch_size)
+                if deleted:
+                    self.logger.info("Удалены истекшие сессии", {"deleted": deleted})
+            except Exception as err:
+                self.logger.error(f"Ошибка при удалении истекших сессий: {err}")
+            await asyncio.sleep(interval)
+
+    async def _refresh_session(
             self,
-            account_id: int,
-            two_fa_status: bool,
-            role: str,
+            refresh_token: str,
+            refresh_token_ttl: int,
+            opaque_refresh_token: bool,
     ) -> model.JWTToken:
-        account = await self.authorization_repo.account_by_id(account_id)
-        if not account:
-            self.logger.info("Аккаунт не найден, создаем новый")
-            await self.authorization_repo.create_account(account_id)
+        # Поиск и ротация сессии в одной транзакции: строка сессии блокируется до коммита.
+        # С write-behind транзакции нет, и один токен нельзя обменять дважды за счет
+        # compare-and-swap в rotate_session: проигравший запрос получает ту же ошибку, что и
+        # обмен уже использованного токена
+        async with self.authorization_repo.transaction():
+            session = await self.authorization_repo.session_by_refresh_token(refresh_token)
+            if not session:
+                self.logger.info("Сессия не найдена по refresh токену")
+                self.token_outcomes.add(1, {"outcome": "account_not_found"})
+                raise common.ErrAccountNotFound()
+            session = session[0]
+
+            token_payload = await self._refresh_token_payload(refresh_token, session)
+            jwt_token, refresh_token_exp = self._issue_tokens(
+                token_payload.account_id,
+                token_payload.two_fa_status,
+                token_payload.role,
+                refresh_token_ttl,
+                opaque_refresh_token,
+            )
+
+            # Сессия устройства сохраняется, меняется только ее refresh токен
+            rotated = await self.authorization_repo.rotate_session(
+                session.id,
+                refresh_token,
+                jwt_token.refresh_token,
+                token_payload.two_fa_status,
+                token_payload.role,
+                refresh_token_exp,
+            )
+            if not rotated:
+                self.logger.info("Refresh токен уже обменян параллельным запросом")
+                self.token_outcomes.add(1, {"outcome": "account_not_found"})
+                raise common.ErrAccountNotFound()
 
-            account = await self.authorization_repo.account_by_id(account_id)
-        account = account[0]
+        self.token_outcomes.add(1, {"outcome": "refreshed"})
+        return jwt_token
+
+    async def _refresh_token_payload(self, refresh_token: str, session: model.Session) -> model.TokenPayload:
+        if not is_opaque_token(refresh_token):
+            return await self.check_token(refresh_token)
+
+        # Claims непрозрачного токена лежат в сессии, найденной по его хэшу
+        if session.expires_at <= time.time():
+            self.token_outcomes.add(1, {"outcome": "expired"})
+            raise jwt.ExpiredSignatureError("Refresh token has expired")
+
+        return model.TokenPayload(
+            account_id=session.account_id,
+            two_fa_status=session.two_fa_status,
+            role=session.role,
+            exp=session.expires_at,
+        )
 
+    def _issue_tokens(
+            self,
+            account_id: int,
+            two_fa_status: bool,
+            role: str,
+            refresh_token_ttl: int,
+            opaque_refresh_token: bool,
+    ) -> tuple[model.JWTToken, int]:
         access_token_payload = {
             "account_id": account_id,
             "two_fa_status": two_fa_status,
             "role": role,
             "exp": int(time.time()) + 15 * 60,
+            "jti": secrets.token_urlsafe(16),
         }
-        access_token = jwt.encode(access_token_payload, self.jwt_secret_key, algorithm="HS256")
+        access_token = self._encode(access_token_payload)
 
         refresh_token_payload = {
             "account_id": account_id,
             "two_fa_status": two_fa_status,
             "role": role,
-            "exp": int(time.time()) + 24 * 365 * 10 * 60,
+            "exp": int(time.time()) + refresh_token_ttl,
+            # Без jti два входа с одинаковыми claims в одну секунду дают одинаковый токен,
+            # а хэш refresh токена в sessions уникален
+            "jti": secrets.token_urlsafe(16),
         }
-        refresh_token = jwt.encode(refresh_token_payload, self.jwt_secret_key, algorithm="HS256")
+        if opaque_refresh_token:
+            refresh_token = new_opaque_token()
+        else:
+            refresh_token = self._encode(refresh_token_payload)
 
-        await self.authorization_repo.update_refresh_token(account.id, refresh_token)
-
-        return model.JWTToken(access_token, refresh_token)
+        return model.JWTToken(access_token, refresh_token), refresh_token_payload["exp"]
 
     @traced_method()
-    async def check_token(self, token: str) -> model.TokenPayload:
-        payload = jwt.decode(
+    async def public_keys(self) -> list[dict]:
+        keys = []
+        for key_id, (public_key, algorithm) in self.verification_keys.items():
+            jwk = jwt.get_algorithm_by_name(algorithm).to_jwk(public_key, as_dict=True)
+            jwk.update({"kid": key_id, "alg": algorithm, "use": "sig"})
+            keys.append(jwk)
+
+        return keys
+
+    def _encode(self, payload: dict) -> str:
+        return jwt.encode(payload, self.signing_key, algorithm=self.jwt_algorithm, headers=self.jwt_headers)
+
+    def _decode(self, token: str) -> dict:
+        if self.verification_keys:
+            key_id = jwt.get_unverified_header(token).get("kid")
+            if key_id in self.verification_keys:
+                public_key, algorithm = self.verification_keys[key_id]
+                return jwt.decode(jwt=token, key=public_key, algorithms=[algorithm])
+
+        # Токены без kid подписаны общим секретом (в том числе выпущенные до перехода на асимметричные ключи)
+        return jwt.decode(
             jwt=token,
             key=self.jwt_secret_key,
             algorithms=["HS256"]
         )
 
-        return model.TokenPayload(
-            account_id=int(payload["account_id"]),
-            two_fa_status=bool(payload["two_fa_status"]),
-            role=payload["role"],
-            exp=int(payload["exp"]),
-        )
 
-    @traced_method()
-    async def refresh_token(self, refresh_token: str) -> model.JWTToken:
-        account = await self.authorization_repo.account_by_refresh_token(refresh_token)
-        if not account:
-            self.logger.info("Аккаунт не найден по refresh токену")
-            raise common.ErrAccountNotFound()
-
-        token_payload = await self.check_token(refresh_token)
-        jwt_token = await self.create_tokens(
-            token_payload.account_id,
-            token_payload.two_fa_status,
-            token_payload.role
-        )
+def new_opaque_token() -> str:
+    # 32 случайных байта в base64url без паддинга (43 символа)
+    return secrets.token_urlsafe(32)
 
-        return jwt_token
 
-    @traced_method()
-    async def refresh_token_tg(self, refresh_token: str) -> model.JWTToken:
-        account = await self.authorization_repo.account_by_refresh_token(refresh_token)
-        if not account:
-            self.logger.info("Аккаунт не найден по refresh токену")
-            raise common.ErrAccountNotFound()
-
-        token_payload = await self.check_token(refresh_token)
-        jwt_token = await self.create_tokens_tg(
-            token_payload.account_id,
-            token_payload.two_fa_status,
-            token_payload.role
-        )
+def is_opaque_token(token: str) -> bool:
+    # JWT всегда состоит из трех частей через точку, в base64url точки нет
+    return "." not in token
 
-        return jwt_token
+
+def _key_thumbprint(public_key) -> str:
+    der = public_key.public_bytes(
+        encoding=serialization.Encoding.DER,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    return hashlib.sha256(der).hexdigest()[:16]
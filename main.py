@@ -1,8 +1,12 @@
+import asyncio
+from contextlib import asynccontextmanager
 from contextvars import ContextVar
 
 import uvicorn
+from fastapi import FastAPI
 
 from infrastructure.pg.pg import PG
+from infrastructure.pg.raw_pg import RawPG
 from infrastructure.telemetry.telemetry import Telemetry, AlertManager
 
 from internal.controller.http.middlerware.middleware import HttpMiddleware
@@ -16,83 +20,166 @@ from internal.app.http.app import NewHTTP
 
 from internal.config.config import Config
 
+from pkg.log_wrapper import configure_auto_log
+
 # Загрузка конфигурации
 cfg = Config()
 
 log_context: ContextVar[dict] = ContextVar('log_context', default={})
 
-# Инициализация системы мониторинга
-alert_manager = AlertManager(
-    cfg.alert_tg_bot_token,
-    cfg.service_name,
-    cfg.alert_tg_chat_id,
-    cfg.alert_tg_chat_thread_id,
-    cfg.grafana_url,
-    cfg.monitoring_redis_host,
-    cfg.monitoring_redis_port,
-    cfg.monitoring_redis_db,
-    cfg.monitoring_redis_password,
-    cfg.openai_api_key
-)
-
-tel = Telemetry(
-    cfg.log_level,
-    cfg.root_path,
-    cfg.environment,
-    cfg.service_name,
-    cfg.service_version,
-    cfg.otlp_host,
-    cfg.otlp_port,
-    log_context,
-    alert_manager
-)
-
-# Инициализация инфраструктуры
-db = PG(tel, cfg.db_user, cfg.db_pass, cfg.db_host, cfg.db_port, cfg.db_name)
-
-# Инициализация репозиториев
-authorization_repo = AccountRepo(tel, db)
-
-# Инициализация сервисов
-authorization_service = AuthorizationService(
-    tel,
-    authorization_repo,
-    cfg.jwt_secret_key,
-)
-
-# Инициализация контроллеров
-authorization_controller = AuthorizationController(
-    tel,
-    authorization_service,
-    cfg.domain
-)
-
-# Инициализация middleware (без клиента Loom Authorization для этого сервиса)
-http_middleware = HttpMiddleware(
-    tel,
-    cfg.prefix,
-    log_context
-)
-
-app = NewHTTP(
-    db,
-    authorization_controller,
-    http_middleware,
-    cfg.prefix,
-    cfg.environment
-)
 
-if __name__ == "__main__":
-    if cfg.environment == "prod":
-        workers = 1
+def create_app() -> FastAPI:
+    # Вызывается в каждом воркере uvicorn: пул соединений, экспортеры телеметрии
+    # и клиенты алертинга не должны разделяться между процессами
+    alert_manager = AlertManager(
+        cfg.alert_tg_bot_token,
+        cfg.service_name,
+        cfg.alert_tg_chat_id,
+        cfg.alert_tg_chat_thread_id,
+        cfg.grafana_url,
+        cfg.monitoring_redis_host,
+        cfg.monitoring_redis_port,
+        cfg.monitoring_redis_db,
+        cfg.monitoring_redis_password,
+        cfg.openai_api_key
+    )
+
+    tel = Telemetry(
+        cfg.log_level,
+        cfg.root_path,
+        cfg.environment,
+        cfg.service_name,
+        cfg.service_version,
+        cfg.otlp_host,
+        cfg.otlp_port,
+        log_context,
+        alert_manager,
+        log_caller_info=cfg.log_caller_info,
+        log_queue_size=cfg.log_queue_size,
+        trace_sampler=cfg.trace_sampler,
+        trace_sample_ratio=cfg.trace_sample_ratio,
+        trace_slow_threshold=cfg.trace_slow_threshold,
+    )
+
+    configure_auto_log(
+        cfg.auto_log_mode,
+        sample_ratio=cfg.auto_log_sample_ratio,
+        slow_threshold=cfg.auto_log_slow_threshold,
+        routes=cfg.auto_log_routes,
+    )
+
+    # Инициализация инфраструктуры
+    if cfg.db_driver == "asyncpg":
+        db = RawPG(
+            tel,
+            cfg.db_user,
+            cfg.db_pass,
+            cfg.db_host,
+            cfg.db_port,
+            cfg.db_name,
+            pgbouncer=cfg.db_pgbouncer,
+            statement_cache_size=cfg.db_statement_cache_size,
+            pool_size=cfg.db_pool_size,
+            max_overflow=cfg.db_max_overflow,
+            pool_idle_timeout=cfg.db_pool_idle_timeout,
+            pool_timeout=cfg.db_pool_timeout,
+            pool_min_size=cfg.db_pool_min_size,
+            slow_query_threshold=cfg.db_slow_query_threshold,
+        )
     else:
-        workers = 1
+        db = PG(
+            tel,
+            cfg.db_user,
+            cfg.db_pass,
+            cfg.db_host,
+            cfg.db_port,
+            cfg.db_name,
+            pool_size=cfg.db_pool_size,
+            max_overflow=cfg.db_max_overflow,
+            pool_recycle=cfg.db_pool_recycle,
+            pool_timeout=cfg.db_pool_timeout,
+            slow_query_threshold=cfg.db_slow_query_threshold,
+        )
+
+    # Инициализация репозиториев
+    authorization_repo = AccountRepo(
+        tel,
+        db,
+        write_behind=cfg.write_behind,
+        write_behind_max_size=cfg.write_behind_max_size,
+        write_behind_max_delay=cfg.write_behind_max_delay,
+    )
 
+    # Инициализация сервисов
+    authorization_service = AuthorizationService(
+        tel,
+        authorization_repo,
+        cfg.jwt_secret_key,
+        cfg.jwt_algorithm,
+        cfg.jwt_private_key,
+        cfg.jwt_key_id,
+        cfg.token_cache_size,
+        cfg.opaque_refresh_token,
+        cfg.opaque_refresh_token_tg,
+    )
+
+    # Инициализация контроллеров
+    authorization_controller = AuthorizationController(
+        tel,
+        authorization_service,
+        cfg.domain,
+        cfg.forward_auth_cache_ttl,
+    )
+
+    # Инициализация middleware (без клиента Loom Authorization для этого сервиса)
+    http_middleware = HttpMiddleware(
+        tel,
+        cfg.prefix,
+        log_context
+    )
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        session_sweeper = None
+        if cfg.session_sweep_interval > 0:
+            session_sweeper = asyncio.create_task(authorization_service.run_session_sweeper(
+                cfg.session_sweep_interval,
+                cfg.session_sweep_batch_size,
+            ))
+
+        yield
+
+        if session_sweeper is not None:
+            session_sweeper.cancel()
+
+        # К этому моменту uvicorn уже дождался завершения запросов в работе
+        await authorization_repo.close()
+        await db.close()
+        await alert_manager.close()
+        try:
+            tel.shutdown()
+        except Exception as err:
+            print(f"Ошибка при остановке телеметрии: {err}", flush=True)
+
+    return NewHTTP(
+        db,
+        authorization_controller,
+        http_middleware,
+        cfg.prefix,
+        cfg.environment,
+        lifespan,
+        cfg.check_fast_path,
+    )
+
+
+if __name__ == "__main__":
     uvicorn.run(
-        "main:app",
+        "main:create_app",
+        factory=True,
         host="0.0.0.0",
         port=int(cfg.http_port),
-        workers=workers,
+        workers=cfg.http_workers,
+        timeout_graceful_shutdown=cfg.http_graceful_shutdown_timeout,
         loop="uvloop",
         access_log=False,
     )
@@ -1,8 +1,14 @@
+import asyncio
+import hashlib
+import time
+
+import jwt
 from opentelemetry.trace import Status, StatusCode, SpanKind
 
 from internal import model
 from internal import interface
 from pkg.client.client import AsyncHTTPClient
+from pkg.ttl_cache import TTLCache
 
 
 class LoomAuthorizationClient(interface.ILoomAuthorizationClient):
@@ -10,7 +16,14 @@ class LoomAuthorizationClient(interface.ILoomAuthorizationClient):
             self,
             tel: interface.ITelemetry,
             host: str,
-            port: int
+            port: int,
+            offline_verification: bool = False,
+            public_keys_ttl: int = 300,
+            batch_window: float = 0,
+            batch_max_size: int = 100,
+            cache_max_size: int = 0,
+            cache_ttl: float = 60,
+            cache_stale_ttl: float = 0,
     ):
         logger = tel.logger()
         self.client = AsyncHTTPClient(
@@ -21,6 +34,46 @@ class LoomAuthorizationClient(interface.ILoomAuthorizationClient):
             logger=logger,
         )
         self.tracer = tel.tracer()
+        self.logger = logger
+
+        # Локальная проверка токенов по публичным ключам сервиса (JWKS)
+        self.offline_verification = offline_verification
+        self.public_keys_ttl = public_keys_ttl
+        self._public_keys: dict[str, jwt.PyJWK] = {}
+        self._public_keys_fetched_at = 0.0
+
+        # Автобатчинг: одновременные проверки за batch_window секунд уходят одним запросом /check/batch
+        self.batch_window = batch_window
+        self.batch_max_size = batch_max_size
+        self._pending_checks: dict[str, asyncio.Future] = {}
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._batch_tasks: set[asyncio.Task] = set()
+
+        # Кэш успешных проверок: запись свежая cache_ttl секунд, затем еще cache_stale_ttl секунд
+        # отдается устаревшей с фоновой перепроверкой. Оба срока ограничены exp токена.
+        self.cache_ttl = cache_ttl
+        self.cache_stale_ttl = cache_stale_ttl
+        self.cache = TTLCache(cache_max_size) if cache_max_size > 0 else None
+        self._revalidation_tasks: dict[bytes, asyncio.Task] = {}
+
+        meter = tel.meter()
+        self.cache_hits = meter.create_counter(
+            "loom_authorization_client.cache.hits",
+            description="Проверки токена, обслуженные из кэша (state: fresh/stale)",
+        )
+        self.cache_misses = meter.create_counter(
+            "loom_authorization_client.cache.misses",
+            description="Проверки токена, ушедшие в сервис авторизации",
+        )
+        self.cache_revalidation_errors = meter.create_counter(
+            "loom_authorization_client.cache.revalidation_errors",
+            description="Неудачные фоновые перепроверки устаревших записей",
+        )
+        self.cache_staleness = meter.create_histogram(
+            "loom_authorization_client.cache.staleness",
+            unit="s",
+            description="Насколько устарела запись, отданная из кэша",
+        )
 
     async def authorization(self, account_id: int) -> model.JWTTokens:
         with self.tracer.start_as_current_span(
@@ -45,11 +98,46 @@ class LoomAuthorizationClient(interface.ILoomAuthorizationClient):
                 raise
 
     async def check_authorization(self, access_token: str) -> model.AuthorizationData:
+        if self.offline_verification:
+            authorization_data = await self._check_authorization_offline(access_token)
+            if authorization_data is not None:
+                return authorization_data
+
+        if self.cache is None or not isinstance(access_token, str):
+            return await self._check_authorization_remote(access_token)
+
+        cache_key = hashlib.sha256(access_token.encode()).digest()
+        entry = self.cache.get(cache_key)
+        if entry is not None:
+            authorization_data, fresh_until = entry
+            now = time.time()
+            if now < fresh_until:
+                self.cache_hits.add(1, {"state": "fresh"})
+            else:
+                self.cache_hits.add(1, {"state": "stale"})
+                self.cache_staleness.record(now - fresh_until)
+                self._revalidate(cache_key, access_token)
+
+            return authorization_data
+
+        self.cache_misses.add(1)
+        authorization_data = await self._check_authorization_remote(access_token)
+        self._cache_result(cache_key, access_token, authorization_data)
+
+        return authorization_data
+
+    async def _check_authorization_remote(self, access_token: str) -> model.AuthorizationData:
         with self.tracer.start_as_current_span(
                 "LoomAuthorizationClient.check_authorization",
                 kind=SpanKind.CLIENT,
         ) as span:
             try:
+                if self.batch_window > 0 and isinstance(access_token, str):
+                    authorization_data = await asyncio.shield(self._enqueue_check(access_token))
+
+                    span.set_status(StatusCode.OK)
+                    return authorization_data
+
                 cookies = {"Access-Token": access_token}
                 response = await self.client.get("/check", cookies=cookies)
                 json_response = response.json()
@@ -59,4 +147,160 @@ class LoomAuthorizationClient(interface.ILoomAuthorizationClient):
             except Exception as err:
                 
                 span.set_status(StatusCode.ERROR, str(err))
-                raise
\ No newline at end of file
+                raise
+
+    def _cache_result(self, cache_key: bytes, access_token: str, authorization_data: model.AuthorizationData) -> None:
+        if authorization_data.status_code != 200:
+            self.cache.delete(cache_key)
+            return
+
+        try:
+            exp = int(jwt.decode(access_token, options={"verify_signature": False})["exp"])
+        except (jwt.InvalidTokenError, KeyError, TypeError, ValueError):
+            return
+
+        now = time.time()
+        fresh_until = min(now + self.cache_ttl, exp)
+        stale_until = min(fresh_until + self.cache_stale_ttl, exp)
+        self.cache.set(cache_key, (authorization_data, fresh_until), stale_until)
+
+    def _revalidate(self, cache_key: bytes, access_token: str) -> None:
+        if cache_key in self._revalidation_tasks:
+            return
+
+        async def revalidate():
+            try:
+                authorization_data = await self._check_authorization_remote(access_token)
+                self._cache_result(cache_key, access_token, authorization_data)
+            except Exception as err:
+                # Устаревшая запись продолжает отдаваться до конца stale-окна
+                self.cache_revalidation_errors.add(1)
+                if self.logger:
+                    self.logger.warning(f"Не удалось перепроверить токен из кэша: {err}")
+            finally:
+                self._revalidation_tasks.pop(cache_key, None)
+
+        self._revalidation_tasks[cache_key] = asyncio.get_running_loop().create_task(revalidate())
+
+    def _enqueue_check(self, access_token: str) -> asyncio.Future:
+        # Одинаковые токены в одном окне ждут один и тот же результат
+        future = self._pending_checks.get(access_token)
+        if future is not None:
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending_checks[access_token] = future
+
+        if len(self._pending_checks) >= self.batch_max_size:
+            self._flush_checks()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush_checks)
+
+        return future
+
+    def _flush_checks(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        pending, self._pending_checks = self._pending_checks, {}
+        if not pending:
+            return
+
+        task = asyncio.get_running_loop().create_task(self._send_batch(pending))
+        self._batch_tasks.add(task)
+        task.add_done_callback(self._batch_tasks.discard)
+
+    async def _send_batch(self, pending: dict[str, asyncio.Future]) -> None:
+        tokens = list(pending)
+        with self.tracer.start_as_current_span(
+                "LoomAuthorizationClient.check_authorization_batch",
+                kind=SpanKind.CLIENT,
+                attributes={
+                    "batch_size": len(tokens)
+                }
+        ) as span:
+            try:
+                response = await self.client.post("/check/batch", json={"tokens": tokens})
+                results = response.json()["results"]
+                # Без результата future вызывающего не завершится никогда: такая пачка целиком - ошибка
+                if len(results) != len(tokens):
+                    raise ValueError(f"check/batch вернул {len(results)} результатов на {len(tokens)} токенов")
+
+                for token, result in zip(tokens, results):
+                    future = pending[token]
+                    if not future.done():
+                        future.set_result(model.AuthorizationData(**result))
+
+                span.set_status(StatusCode.OK)
+            except Exception as err:
+                span.set_status(StatusCode.ERROR, str(err))
+                for future in pending.values():
+                    if not future.done():
+                        future.set_exception(err)
+
+    async def _check_authorization_offline(self, access_token: str) -> model.AuthorizationData | None:
+        try:
+            key_id = jwt.get_unverified_header(access_token).get("kid")
+        except jwt.InvalidTokenError:
+            return _authorization_error("token invalid")
+
+        # Токен подписан общим секретом - проверить его может только сервис авторизации
+        if not key_id:
+            return None
+
+        public_key = await self._public_key(key_id)
+        if public_key is None:
+            return None
+
+        try:
+            payload = jwt.decode(
+                jwt=access_token,
+                key=public_key.key,
+                algorithms=[public_key.algorithm_name],
+            )
+        except jwt.ExpiredSignatureError:
+            return _authorization_error("token expired")
+        except jwt.InvalidTokenError:
+            return _authorization_error("token invalid")
+
+        return model.AuthorizationData(
+            account_id=int(payload["account_id"]),
+            two_fa_status=bool(payload["two_fa_status"]),
+            role=payload["role"],
+            message="Access-Token verified",
+            status_code=200,
+        )
+
+    async def _public_key(self, key_id: str) -> jwt.PyJWK | None:
+        expired = time.monotonic() - self._public_keys_fetched_at > self.public_keys_ttl
+        if expired or key_id not in self._public_keys:
+            try:
+                await self._refresh_public_keys()
+            except Exception as err:
+                # При недоступности JWKS продолжаем работать с закэшированными ключами или через /check
+                if self.logger:
+                    self.logger.warning(f"Не удалось обновить публичные ключи: {err}")
+
+        return self._public_keys.get(key_id)
+
+    async def _refresh_public_keys(self) -> None:
+        # Неизвестный kid не должен приводить к запросу JWKS на каждый вызов
+        if time.monotonic() - self._public_keys_fetched_at < 1:
+            return
+
+        self._public_keys_fetched_at = time.monotonic()
+        response = await self.client.get("/jwks")
+        key_set = jwt.PyJWKSet.from_dict(response.json())
+        self._public_keys = {key.key_id: key for key in key_set.keys if key.key_id}
+
+
+def _authorization_error(message: str) -> model.AuthorizationData:
+    return model.AuthorizationData(
+        account_id=-1,
+        two_fa_status=False,
+        role="",
+        message=message,
+        status_code=403,
+    )
@@ -1 +1 @@
-from pkg.log_wrapper.log_wrapper import auto_log
\ No newline at end of file
+from pkg.log_wrapper.log_wrapper import auto_log, configure_auto_log
\ No newline at end of file
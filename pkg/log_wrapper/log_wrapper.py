@@ -1,25 +1,82 @@
 import functools
+import random
+import time
 import traceback
 from typing import Callable, Any
 import inspect
 
-def auto_log():
+# all - начало и завершение, off - ничего, errors - только ошибки,
+# sampled - начало и завершение для доли вызовов, slow - завершение вызовов дольше порога.
+# Ошибки логируются с traceback в любом режиме
+AUTO_LOG_MODES = {"all", "off", "errors", "sampled", "slow"}
+
+_settings = {
+    "mode": "all",
+    "sample_ratio": 1.0,
+    "slow_threshold": 0.5,
+    "routes": {},
+}
+
+
+def configure_auto_log(
+        mode: str = "all",
+        sample_ratio: float = 1.0,
+        slow_threshold: float = 0.5,
+        routes: dict[str, str] = None,
+) -> None:
+    """
+    Общие настройки auto_log. routes переопределяет режим для отдельных методов: {"Class.method": "errors"}
+    и имеет приоритет над режимом, заданным в декораторе.
+    """
+    for name, route_mode in {"*": mode, **(routes or {})}.items():
+        if route_mode not in AUTO_LOG_MODES:
+            raise ValueError(f"Неизвестный режим auto_log для {name}: {route_mode}")
+
+    _settings["mode"] = mode
+    _settings["sample_ratio"] = sample_ratio
+    _settings["slow_threshold"] = slow_threshold
+    _settings["routes"] = dict(routes or {})
+
+
+def auto_log(
+        mode: str = None,
+        sample_ratio: float = None,
+        slow_threshold: float = None,
+        name: str = None,
+):
+    # name заменяет имя метода в логах и в ключе routes: два входа одной операции настраиваются вместе
+    if mode is not None and mode not in AUTO_LOG_MODES:
+        raise ValueError(f"Неизвестный режим auto_log: {mode}")
+
     def decorator(func: Callable) -> Callable:
+        method_name = name or func.__name__
+
+        def policy(name: str) -> tuple[str, float, float]:
+            return (
+                _settings["routes"].get(name) or mode or _settings["mode"],
+                _settings["sample_ratio"] if sample_ratio is None else sample_ratio,
+                _settings["slow_threshold"] if slow_threshold is None else slow_threshold,
+            )
+
         @functools.wraps(func)
         async def async_wrapper(self, *args, **kwargs) -> Any:
             class_name = self.__class__.__name__
-            method_name = func.__name__
+            name = f"{class_name}.{method_name}"
 
             logger = getattr(self, 'logger', None)
+            call_mode, call_sample_ratio, call_slow_threshold = policy(name)
+            log_call = call_mode == "all" or (call_mode == "sampled" and random.random() < call_sample_ratio)
 
-            if logger:
-                logger.info(f"Начало {class_name}.{method_name}")
+            if logger and log_call:
+                logger.info(f"Начало {name}")
 
+            start = time.perf_counter()
             try:
                 result = await func(self, *args, **kwargs)
 
-                if logger:
-                    logger.info(f"Завершение {class_name}.{method_name}")
+                duration = time.perf_counter() - start
+                if logger and (log_call or (call_mode == "slow" and duration >= call_slow_threshold)):
+                    logger.info(f"Завершение {name}", {"duration": duration})
 
                 return result
             except Exception as e:
@@ -32,18 +89,22 @@ def auto_log():
         @functools.wraps(func)
         def sync_wrapper(self, *args, **kwargs) -> Any:
             class_name = self.__class__.__name__
-            method_name = func.__name__
+            name = f"{class_name}.{method_name}"
 
             logger = getattr(self, 'logger', None)
+            call_mode, call_sample_ratio, call_slow_threshold = policy(name)
+            log_call = call_mode == "all" or (call_mode == "sampled" and random.random() < call_sample_ratio)
 
-            if logger:
-                logger.info(f"Начало {class_name}.{method_name}")
+            if logger and log_call:
+                logger.info(f"Начало {name}")
 
+            start = time.perf_counter()
             try:
                 result = func(self, *args, **kwargs)
 
-                if logger:
-                    logger.info(f"Завершение {class_name}.{method_name}")
+                duration = time.perf_counter() - start
+                if logger and (log_call or (call_mode == "slow" and duration >= call_slow_threshold)):
+                    logger.info(f"Завершение {name}", {"duration": duration})
 
                 return result
             except Exception as e:
@@ -58,4 +119,4 @@ def auto_log():
         else:
             return sync_wrapper
 
-    return decorator
\ No newline at end of file
+    return decorator
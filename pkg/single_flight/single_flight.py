@@ -0,0 +1,77 @@
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Callable, Hashable, Sequence
+
+
+class SingleFlight:
+    """Объединяет одновременные вызовы с одинаковым ключом в одно выполнение."""
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        """Возвращает результат и признак того, что вызов присоединился к уже выполняющемуся."""
+        call = self._calls.get(key)
+        if call is not None:
+            return await asyncio.shield(call), True
+
+        # Отдельная задача: отмена первого вызывающего не должна отменять общий вызов
+        call = asyncio.ensure_future(fn())
+        self._calls[key] = call
+        call.add_done_callback(lambda _: self._calls.pop(key, None))
+
+        return await asyncio.shield(call), False
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+
+class SingleFlightBatch:
+    """
+    Объединяет одновременные вызовы с одинаковым ключом в пачки: пока пачка ключа выполняется,
+    новые элементы копятся и уходят следующей пачкой одним вызовом fn(key, items).
+    Без конкуренции элемент уходит сразу, задержки на сбор пачки нет.
+    fn возвращает результаты по каждому элементу в порядке пачки.
+    """
+
+    def __init__(self, fn: Callable[[Hashable, list[Any]], Awaitable[Sequence[Any]]]):
+        self.fn = fn
+        self._pending: dict[Hashable, list[tuple[Any, asyncio.Future]]] = {}
+
+    async def do(self, key: Hashable, item: Any) -> tuple[Any, bool]:
+        """Возвращает результат элемента и признак того, что он ушел в пачке не первым."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = []
+            # Пачки пишутся вне контекста вызвавшей задачи, чтобы не попасть в её транзакцию;
+            # отмена вызывающего не отменяет пачку
+            loop.create_task(self._run(key), context=contextvars.Context())
+        pending.append((item, future))
+
+        return await asyncio.shield(future)
+
+    async def _run(self, key: Hashable) -> None:
+        try:
+            while self._pending[key]:
+                batch, self._pending[key] = self._pending[key], []
+                try:
+                    results = await self.fn(key, [item for item, _ in batch])
+                    if len(results) != len(batch):
+                        raise RuntimeError(f"fn вернул {len(results)} результатов на пачку из {len(batch)}")
+                except Exception as err:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(err)
+                    continue
+
+                for i, ((_, future), result) in enumerate(zip(batch, results)):
+                    if not future.done():
+                        future.set_result((result, i > 0))
+        finally:
+            del self._pending[key]
+
+    def __len__(self) -> int:
+        return len(self._pending)
@@ -3,49 +3,37 @@ from typing import Any, Callable
 from opentelemetry.trace import SpanKind, StatusCode
 import inspect
 
+_REDACTED = "***REDACTED***"
+
 
 def traced_method(
         span_kind: SpanKind = SpanKind.INTERNAL,
         exclude_params: set[str] = None,
-        sensitive_params: set[str] = None
+        sensitive_params: set[str] = None,
+        include_params: set[str] = None,
+        name: str = None,
 ):
+    # name заменяет имя метода в имени span: два входа одной операции пишутся одним span
     if exclude_params is None:
         exclude_params = {'self', 'cls'}
     if sensitive_params is None:
-        sensitive_params = {'password', 'token', 'secret', 'api_key'}
+        sensitive_params = {
+            'password', 'token', 'secret', 'api_key',
+            'access_token', 'refresh_token', 'old_refresh_token',
+        }
 
     def decorator(func: Callable) -> Callable:
+        method_name = name or func.__name__
+        build_attributes = _attributes_builder(func, exclude_params, sensitive_params, include_params)
+
         @wraps(func)
         async def async_wrapper(self, *args, **kwargs):
-            # Получаем имя класса и метода
-            class_name = self.__class__.__name__
-            method_name = func.__name__
-            span_name = f"{class_name}.{method_name}"
-
-            # Собираем все параметры
-            sig = inspect.signature(func)
-            bound_args = sig.bind(self, *args, **kwargs)
-            bound_args.apply_defaults()
+            span_name = f"{self.__class__.__name__}.{method_name}"
 
-            # Формируем атрибуты для span'а
-            attributes = {}
-            for param_name, param_value in bound_args.arguments.items():
-                if param_name in exclude_params:
-                    continue
-
-                # Маскируем чувствительные данные
-                if param_name in sensitive_params:
-                    attributes[param_name] = "***REDACTED***"
-                else:
-                    # Конвертируем значение в строку для атрибутов
-                    attributes[param_name] = _serialize_value(param_value)
-
-            # Создаем span
-            with self.tracer.start_as_current_span(
-                    span_name,
-                    kind=span_kind,
-                    attributes=attributes
-            ) as span:
+            with self.tracer.start_as_current_span(span_name, kind=span_kind) as span:
+                # Для span, которые не пишутся (сэмплер отбросил трейс), атрибуты не собираем
+                if span.is_recording():
+                    span.set_attributes(build_attributes(args, kwargs))
                 try:
                     result = await func(self, *args, **kwargs)
                     span.set_status(StatusCode.OK)
@@ -56,29 +44,11 @@ def traced_method(
 
         @wraps(func)
         def sync_wrapper(self, *args, **kwargs):
-            class_name = self.__class__.__name__
-            method_name = func.__name__
-            span_name = f"{class_name}.{method_name}"
-
-            sig = inspect.signature(func)
-            bound_args = sig.bind(self, *args, **kwargs)
-            bound_args.apply_defaults()
+            span_name = f"{self.__class__.__name__}.{method_name}"
 
-            attributes = {}
-            for param_name, param_value in bound_args.arguments.items():
-                if param_name in exclude_params:
-                    continue
-
-                if param_name in sensitive_params:
-                    attributes[param_name] = "***REDACTED***"
-                else:
-                    attributes[param_name] = _serialize_value(param_value)
-
-            with self.tracer.start_as_current_span(
-                    span_name,
-                    kind=span_kind,
-                    attributes=attributes
-            ) as span:
+            with self.tracer.start_as_current_span(span_name, kind=span_kind) as span:
+                if span.is_recording():
+                    span.set_attributes(build_attributes(args, kwargs))
                 try:
                     result = func(self, *args, **kwargs)
                     span.set_status(StatusCode.OK)
@@ -97,6 +67,67 @@ def traced_method(
     return decorator
 
 
+def _attributes_builder(
+        func: Callable,
+        exclude_params: set[str],
+        sensitive_params: set[str],
+        include_params: set[str] | None,
+) -> Callable[[tuple, dict], dict]:
+    """Разбирает сигнатуру один раз при декорировании и возвращает сборщик атрибутов span для вызова."""
+    sig = inspect.signature(func)
+    params = list(sig.parameters.values())[1:]  # без self
+
+    def traced(name: str) -> bool:
+        if name in exclude_params:
+            return False
+        return include_params is None or name in include_params
+
+    # *args / **kwargs: раскладку по именам делает bind, как раньше
+    if any(p.kind in (p.VAR_POSITIONAL, p.VAR_KEYWORD) for p in params):
+        def build_bound(args: tuple, kwargs: dict) -> dict:
+            bound_args = sig.bind(None, *args, **kwargs)
+            bound_args.apply_defaults()
+            return {
+                name: _REDACTED if name in sensitive_params else _serialize_value(value)
+                for name, value in list(bound_args.arguments.items())[1:]
+                if traced(name)
+            }
+
+        return build_bound
+
+    # Для каждой позиции: имя атрибута и нужно ли скрыть значение; None - параметр не пишется
+    positional = [
+        (p.name, p.name in sensitive_params) if traced(p.name) else None
+        for p in params
+        if p.kind != p.KEYWORD_ONLY
+    ]
+    keywords = {
+        p.name: p.name in sensitive_params
+        for p in params
+        if traced(p.name)
+    }
+    # Значения по умолчанию сериализуются заранее, вызов перезаписывает переданные
+    defaults = {
+        p.name: _REDACTED if p.name in sensitive_params else _serialize_value(p.default)
+        for p in params
+        if traced(p.name) and p.default is not p.empty
+    }
+
+    def build(args: tuple, kwargs: dict) -> dict:
+        attributes = defaults.copy()
+        for param, value in zip(positional, args):
+            if param is not None:
+                name, sensitive = param
+                attributes[name] = _REDACTED if sensitive else _serialize_value(value)
+        for name, value in kwargs.items():
+            sensitive = keywords.get(name)
+            if sensitive is not None:
+                attributes[name] = _REDACTED if sensitive else _serialize_value(value)
+        return attributes
+
+    return build
+
+
 def _serialize_value(value: Any) -> str:
     """Сериализует значение для атрибутов OpenTelemetry."""
     if value is None:
@@ -108,4 +139,4 @@ def _serialize_value(value: Any) -> str:
     if isinstance(value, dict):
         return f"{{dict with {len(value)} keys}}"
 
-    return f"<{value.__class__.__name__}>"
\ No newline at end of file
+    return f"<{value.__class__.__name__}>"
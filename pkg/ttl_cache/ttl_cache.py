@@ -0,0 +1,56 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """LRU-кэш ограниченного размера, в котором у каждой записи свой срок жизни."""
+
+    def __init__(
+            self,
+            max_size: int,
+            on_evict: Optional[Callable[[str], None]] = None,
+    ):
+        self.max_size = max_size
+        self.on_evict = on_evict
+
+        # key -> (value, expires_at)
+        self._entries: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        value, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self._evicted("expired")
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, expires_at: float) -> None:
+        if self.max_size <= 0 or expires_at <= time.time():
+            return
+
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._evicted("size")
+
+    def delete(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evicted(self, reason: str) -> None:
+        if self.on_evict is not None:
+            self.on_evict(reason)
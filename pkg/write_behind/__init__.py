@@ -0,0 +1 @@
+from pkg.write_behind.write_behind import WriteBehindBuffer
\ No newline at end of file
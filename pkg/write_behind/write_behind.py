@@ -0,0 +1,79 @@
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Callable, Sequence
+
+
+class WriteBehindBuffer:
+    """
+    Копит записи не дольше max_delay секунд или до max_size штук и сбрасывает их одним вызовом flush.
+    write() завершается только после успешного flush пачки, в которую попала запись.
+    flush может вернуть результаты по каждой записи в порядке пачки: write() вернет результат своей записи.
+    """
+
+    def __init__(
+            self,
+            flush: Callable[[list[Any]], Awaitable[Sequence[Any] | None]],
+            max_size: int = 500,
+            max_delay: float = 0.005,
+    ):
+        self.flush = flush
+        self.max_size = max_size
+        self.max_delay = max_delay
+
+        self._items: list[tuple[Any, asyncio.Future]] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._flush_tasks: set[asyncio.Task] = set()
+        self._closed = False
+
+    async def write(self, item: Any) -> Any:
+        if self._closed:
+            results = await self.flush([item])
+            return results[0] if results is not None else None
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._items.append((item, future))
+
+        if len(self._items) >= self.max_size:
+            self._flush_now()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_delay, self._flush_now, context=contextvars.Context())
+
+        return await asyncio.shield(future)
+
+    async def close(self) -> None:
+        self._closed = True
+        self._flush_now()
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+
+    def _flush_now(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._items = self._items, []
+        if not batch:
+            return
+
+        # Пачка пишется вне контекста вызвавшей задачи, чтобы не попасть в её транзакцию
+        task = asyncio.get_running_loop().create_task(self._flush_batch(batch), context=contextvars.Context())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _flush_batch(self, batch: list[tuple[Any, asyncio.Future]]) -> None:
+        try:
+            results = await self.flush([item for item, _ in batch])
+            if results is None:
+                results = [None] * len(batch)
+            elif len(results) != len(batch):
+                raise RuntimeError(f"flush вернул {len(results)} результатов на пачку из {len(batch)}")
+        except Exception as err:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(err)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)